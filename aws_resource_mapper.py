@@ -1,91 +1,290 @@
 import argparse
+import functools
 import getpass
-import itertools
-from typing import Dict
+import os
+from typing import Dict, List, Set, Tuple
 import sys
+import time
 
-import boto3
-from botocore.exceptions import NoCredentialsError
-from neo4j import GraphDatabase
-from neo4j.exceptions import AuthError
+from resources.checkpoint import Checkpoint
+from resources.concurrency import detail_calls
+from resources.csv_export import IMPORT_ARGS, export_csv
+from resources.incremental_sync import sync_incrementally
+from resources.ingestion import Neo4jIngestor, TeeIngestor
+from resources.metrics import Profiler, metrics
+from resources.pipeline import ingest_while_collecting
+from resources.reachability import Reachability, ReachabilityIndex, ReachabilityQuery, build_reachability_index
+from resources.registry import Service, registry
+from resources.relationships import RelationshipBuilder
+from resources.snapshot import load_snapshot, write_snapshot
 
-from resources.dynamodb_table import retrieve_dynamodb_tables
-from resources.glue_catalog import retrieve_glue_catalog
-from resources.glue_database import retrieve_glue_databases
-from resources.glue_table import retrieve_glue_tables
-from resources.iam_role import retrieve_iam_roles
-from resources.kms_key import retrieve_kms_keys
-from resources.lmbda import retrieve_lambda_functions
-from resources.s3_bucket import retrieve_s3_buckets
-from resources.sns_topic import retrieve_sns_topics
-from resources.sqs_queue import retrieve_sqs_queues
 
+def comma_separated(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
 
+
+registry.discover_plugins()
 parser = argparse.ArgumentParser(
     description="Map AWS resources in a Neo4j Graph Database"
 )
 parser.add_argument("--url", metavar="url", type=str, help="URL of Neo4j Database to map AWS resources in", default="bolt://localhost:7687")
 parser.add_argument("--user", metavar="user", type=str, help="Neo4j user to map AWS resources as", default="neo4j")
+parser.add_argument("--batch-size", metavar="batch_size", type=int, help="Number of nodes or relationships to write to Neo4j per transaction", default=1000)
+parser.add_argument("--services", metavar="services", type=comma_separated, help=f"Comma-separated services to collect, out of: {', '.join(registry.services)} (default: all)", default=[])
+parser.add_argument("--workers", metavar="workers", type=int, help="Number of AWS resource collectors to run concurrently", default=4)
+parser.add_argument("--profiles", metavar="profiles", type=comma_separated, help="Comma-separated AWS profiles to collect resources with", default=[])
+parser.add_argument("--role-arns", metavar="role_arns", type=comma_separated, help="Comma-separated IAM role ARNs to assume and collect resources with", default=[])
+parser.add_argument("--regions", metavar="regions", type=comma_separated, help="Comma-separated AWS regions to collect resources from", default=[])
+parser.add_argument("--incremental", action="store_true", help="Only write resources that were added, changed or removed since the last run")
+parser.add_argument("--snapshot-dir", metavar="snapshot_dir", type=str, help="Directory to write a snapshot of the collected AWS resources to", default=None)
+parser.add_argument("--from-snapshot", metavar="snapshot", type=str, help="Snapshot, or directory of snapshots, to map instead of collecting from AWS", default=None)
+parser.add_argument("--skip-ingestion", action="store_true", help="Collect AWS resources without writing them to Neo4j")
+parser.add_argument("--detail-concurrency", metavar="detail_concurrency", type=int, help="Number of per-resource detail calls (describe_table, get_queue_attributes, get_bucket_policy, list_event_source_mappings, list_subscriptions_by_topic) each collector keeps in flight", default=8)
+parser.add_argument("--max-retries", metavar="max_retries", type=int, help="Number of times to retry a throttled or failed AWS API call", default=8)
+parser.add_argument("--checkpoint", metavar="checkpoint", type=str, help="State file to record collection progress in, so an interrupted run can be resumed", default=None)
+parser.add_argument("--resume", action="store_true", help="Resume collection from the state file given with --checkpoint instead of starting over")
+parser.add_argument("--pipeline", action="store_true", help="Write AWS resources to Neo4j while they are being collected")
+parser.add_argument("--queue-size", metavar="queue_size", type=int, help="Number of collected AWS resources to buffer ahead of Neo4j in pipeline mode", default=1000)
+parser.add_argument("--export-csv", metavar="export_dir", type=str, help="Directory to write neo4j-admin import CSV files to instead of writing to Neo4j", default=None)
+parser.add_argument("--collapse-actions", action="store_true", help="Write one CAN_ACCESS relationship per accessible resource with an actions list instead of one relationship per action")
+parser.add_argument("--reachability-index", metavar="reachability_index", type=str, help="File to write an index of what every resource can transitively reach to, and a reach_count property on every node", default=None)
+parser.add_argument("--can-reach-edges", action="store_true", help="Also write a CAN_REACH relationship from every resource to everything it can transitively reach")
+parser.add_argument("--reach-from", metavar="arn", type=str, help="Print what the resource with this ARN can transitively reach according to --reachability-index and exit", default=None)
+parser.add_argument("--glue-include", metavar="glue_include", type=comma_separated, help="Comma-separated Glue database name patterns to collect, all databases by default", default=[])
+parser.add_argument("--glue-exclude", metavar="glue_exclude", type=comma_separated, help="Comma-separated Glue database name patterns to skip", default=[])
+parser.add_argument("--glue-concurrency", metavar="glue_concurrency", type=int, help="Number of Glue databases to page through tables of concurrently", default=8)
+parser.add_argument("--profile", metavar="profiler", type=str, choices=Profiler.kinds, help=f"Profile the run with one of: {', '.join(Profiler.kinds)}", default=None)
+parser.add_argument("--profile-output", metavar="profile_output", type=str, help="File to write the profile to (default: aws-resource-mapper.prof for cprofile, aws-resource-mapper.html for pyinstrument)", default=None)
+parser.add_argument("--report-json", metavar="report_json", type=str, help="File to write a JSON report of the run's timers and counters to", default=None)
+parser.add_argument("--prometheus-textfile", metavar="prometheus_textfile", type=str, help="File to write the run's timers and counters to in Prometheus textfile format", default=None)
 args = parser.parse_args()
-password: str = getpass.getpass(f"[*] Password of Neo4j user {args.user} to map AWS resources as: ")
+if args.batch_size < 1:
+    parser.error("--batch-size must be at least 1")
+if args.workers < 1:
+    parser.error("--workers must be at least 1")
+if args.max_retries < 0:
+    parser.error("--max-retries must be at least 0")
+if args.detail_concurrency < 1:
+    parser.error("--detail-concurrency must be at least 1")
+if args.queue_size < 1:
+    parser.error("--queue-size must be at least 1")
+if args.glue_concurrency < 1:
+    parser.error("--glue-concurrency must be at least 1")
+if args.skip_ingestion and args.snapshot_dir is None:
+    parser.error("--skip-ingestion requires --snapshot-dir")
+if args.pipeline and (args.incremental or args.skip_ingestion or args.snapshot_dir is not None or args.from_snapshot is not None):
+    parser.error("--pipeline can't be combined with --incremental, --skip-ingestion, --snapshot-dir or --from-snapshot")
+if args.export_csv is not None and (args.pipeline or args.incremental or args.skip_ingestion):
+    parser.error("--export-csv can't be combined with --pipeline, --incremental or --skip-ingestion")
+if args.resume and args.checkpoint is None:
+    parser.error("--resume requires --checkpoint")
+if args.checkpoint is not None and args.from_snapshot is not None:
+    parser.error("--checkpoint can't be combined with --from-snapshot")
+if args.services and args.from_snapshot is not None:
+    parser.error("--services can't be combined with --from-snapshot")
 
-print("[*] Attempting to authenticate to Neo4j...")
-try:
-    driver = GraphDatabase.driver(
-        args.url,
-        auth=(args.user, password)
-    )
-except AuthError:
-    print(f"[!] Neo4j credentials ({args.user}, {password}) are invalid! Exiting...")
-    sys.exit(1)
-print("[*] Authentication to Neo4j successful!")
-
-sts = boto3.client("sts")
+# Wildcards would expand against empty inventories for the services that weren't collected, and
+# incremental sync would delete the expanded relationships that point at them
+if args.services and args.incremental:
+    parser.error("--services can't be combined with --incremental")
+if (args.can_reach_edges or args.reach_from is not None) and args.reachability_index is None:
+    parser.error("--can-reach-edges and --reach-from require --reachability-index")
+if args.can_reach_edges and (args.skip_ingestion or args.export_csv is not None):
+    parser.error("--can-reach-edges can't be combined with --skip-ingestion or --export-csv")
 try:
-    sts.get_caller_identity()
-except NoCredentialsError:
-    print("[!] Unable to locate AWS credentials. Exiting...")
-    sys.exit(1)
-
-print("[*] Attempting to gather resource information from AWS using boto3 credentials...")
-aws_resource_generator = itertools.chain(
-    retrieve_dynamodb_tables(),
-    retrieve_glue_catalog(),
-    retrieve_glue_databases(),
-    retrieve_glue_tables(),
-    retrieve_iam_roles(),
-    retrieve_kms_keys(),
-    retrieve_s3_buckets(),
-    retrieve_sns_topics(),
-    retrieve_sqs_queues(),
-    retrieve_lambda_functions()
-)
-aws_resources: Dict[str, Dict[str, dict]] = {
-    "DynamoDBTable": {},
-    "GlueCatalog": {},
-    "GlueDatabase": {},
-    "GlueTable": {},
-    "IAMRole": {},
-    "KMSKey": {},
-    "Lambda": {},
-    "S3Bucket": {},
-    "SNSTopic": {},
-    "SQSQueue": {},
-}
-for aws_resource in aws_resource_generator:
-    aws_resources[aws_resource.aws_resource_type][aws_resource.arn] = aws_resource
-print("[*] AWS resource collection complete")
-
-print("[*] Attempting to ingest AWS resources into Neo4j...")
-with driver.session() as session:
-    for aws_resource_category in aws_resources:
-        for resource_arn in aws_resources[aws_resource_category]:
-            session.write_transaction(aws_resources[aws_resource_category][resource_arn].create_neo4j_node)
-
-with driver.session() as session:
-    for aws_resource_category in aws_resources:
-        for resource_arn in aws_resources[aws_resource_category]:
-            session.write_transaction(aws_resources[aws_resource_category][resource_arn].create_neo4j_relationships, aws_resources)
-
-driver.close()
-print("[*] Neo4j ingestion complete!")
+    services: List[Service] = registry.select(args.services)
+except ValueError as e:
+    parser.error(str(e))
+
+# Answering from a saved index needs neither AWS nor Neo4j
+if args.reach_from is not None:
+    try:
+        reachable = ReachabilityQuery(args.reachability_index).reachable(args.reach_from)
+    except (OSError, ValueError) as e:
+        print(f"[!] {e}")
+        sys.exit(1)
+    print(f"[*] {args.reach_from} can reach {len(reachable)} resources:")
+    for label, arn in reachable:
+        print(f"    {label} {arn}")
+    sys.exit(0)
+
+# boto3 and the Neo4j driver are only imported by runs that collect from AWS or write to Neo4j
+write_to_neo4j: bool = not args.skip_ingestion and args.export_csv is None
+if write_to_neo4j:
+    from neo4j import GraphDatabase
+    from neo4j.exceptions import AuthError
+
+    from resources.neo4j_schema import ensure_schema, verify_schema
+
+    password: str = getpass.getpass(f"[*] Password of Neo4j user {args.user} to map AWS resources as: ")
+
+    print("[*] Attempting to authenticate to Neo4j...")
+    try:
+        driver = GraphDatabase.driver(
+            args.url,
+            auth=(args.user, password)
+        )
+    except AuthError:
+        print(f"[!] Neo4j credentials ({args.user}, {password}) are invalid! Exiting...")
+        sys.exit(1)
+    print("[*] Authentication to Neo4j successful!")
+
+    # Without an index on arn every MERGE is a label scan, which gets slower the bigger the graph is
+    with driver.session() as session, metrics.timer("stage.neo4j_schema"):
+        schema: Dict[str, str] = ensure_schema(session)
+        unindexed_labels: List[str] = verify_schema(session)
+    constraint_count: int = list(schema.values()).count("constraint")
+    print(f"[*] Neo4j schema ready ({constraint_count} uniqueness constraints, {len(schema) - constraint_count} indexes on arn)")
+    if unindexed_labels:
+        print(f"[!] No online index on arn for: {', '.join(unindexed_labels)}")
+
+profiler: Profiler = None
+if args.profile is not None:
+    try:
+        profiler = Profiler(args.profile)
+    except ImportError as e:
+        parser.error(str(e))
+    profiler.start()
+run_start: float = time.perf_counter()
+
+aws_resources: Dict[str, Dict[str, dict]] = registry.empty_inventory()
+
+# Runs that build every relationship anyway feed the reachability index from the same pass
+reachability_index: ReachabilityIndex = None
+if args.reachability_index is not None and (args.pipeline or (write_to_neo4j and not args.incremental)):
+    reachability_index = ReachabilityIndex()
+collector_timings: Dict[str, float] = {}
+collected_scopes: Set[Tuple[str, str]] = None
+if args.from_snapshot is not None:
+    print("[*] Attempting to load AWS resources from snapshot...")
+    with metrics.timer("stage.load_snapshot"):
+        snapshot_path: str = load_snapshot(args.from_snapshot, aws_resources)
+    print(f"[*] AWS resources loaded from {snapshot_path}")
+else:
+    from botocore.exceptions import NoCredentialsError
+
+    from resources.call_scheduler import call_scheduler
+    from resources.collection import collect_aws_resources, resolve_collection_targets, stream_aws_resources
+
+    print("[*] Attempting to gather resource information from AWS using boto3 credentials...")
+    call_scheduler.max_retries = args.max_retries
+    detail_calls.concurrency = args.detail_concurrency
+    try:
+        targets = resolve_collection_targets(args.profiles, args.role_arns, args.regions)
+    except NoCredentialsError:
+        print("[!] Unable to locate AWS credentials. Exiting...")
+        sys.exit(1)
+
+    # Every target's region and its account's global services were collected, even where they came up empty
+    collected_scopes = {(target.account_id, target.region_name) for target in targets} | {(target.account_id, "global") for target in targets}
+
+    # Only the selected services' modules are imported
+    collectors = []
+    global_collectors = []
+    for service in services:
+        collector = service.load_collector()
+        if service.name == "glue":
+
+            # The partial keeps the collector's name for the timings
+            collector = functools.update_wrapper(
+                functools.partial(collector, include=args.glue_include, exclude=args.glue_exclude, concurrency=args.glue_concurrency),
+                collector
+            )
+        collectors.append(collector)
+        if service.is_global:
+            global_collectors.append(collector)
+    checkpoint: Checkpoint = None
+    if args.checkpoint is not None:
+        checkpoint = Checkpoint(args.checkpoint, args.resume)
+        if args.resume:
+            finished_jobs: int = sum(job.finished for job in checkpoint.jobs.values())
+            print(f"[*] Resuming from {args.checkpoint} ({finished_jobs} finished collection jobs, {len(checkpoint.jobs) - finished_jobs} to pick up)")
+    if args.pipeline:
+        print("[*] Attempting to ingest AWS resources into Neo4j as they are collected...")
+        with driver.session() as session:
+            ingestor = Neo4jIngestor(session, args.batch_size)
+            with metrics.timer("stage.pipeline"):
+                deferred_count: int = ingest_while_collecting(
+                    TeeIngestor(ingestor, reachability_index) if reachability_index is not None else ingestor,
+                    stream_aws_resources(collectors, global_collectors, targets, args.workers, collector_timings, args.queue_size, checkpoint),
+                    aws_resources,
+                    RelationshipBuilder(aws_resources, args.collapse_actions)
+                )
+        print(f"[*] AWS resource collection complete ({call_scheduler})")
+        print(f"[*] Neo4j ingestion complete! ({ingestor.transactions} transactions, {deferred_count} resources waited for the full inventory)")
+    else:
+        with metrics.timer("stage.collection"):
+            collector_timings = collect_aws_resources(collectors, global_collectors, targets, aws_resources, args.workers, checkpoint)
+        print(f"[*] AWS resource collection complete ({call_scheduler})")
+    if checkpoint is not None:
+        checkpoint.close()
+    if "iam_policy_resolver.misses" in metrics.counters:
+        print(f"[*] IAM policy cache: {metrics.counters.get('iam_policy_resolver.hits', 0)} hits, {metrics.counters['iam_policy_resolver.misses']} misses")
+
+    if args.snapshot_dir is not None:
+        with metrics.timer("stage.write_snapshot"):
+            snapshot_path: str = write_snapshot(args.snapshot_dir, aws_resources)
+        print(f"[*] Snapshot written to {snapshot_path}")
+
+if args.export_csv is not None:
+    print("[*] Attempting to export AWS resources as neo4j-admin import files...")
+    with metrics.timer("stage.export_csv"):
+        exporter = export_csv(args.export_csv, aws_resources, args.collapse_actions)
+    print(f"[*] Export complete! ({exporter.nodes} nodes, {exporter.relationships} relationships)")
+    print(f"[*] Import them into an empty database with: neo4j-admin database import full --array-delimiter=';' @{os.path.join(args.export_csv, IMPORT_ARGS)}")
+
+if write_to_neo4j and not args.pipeline:
+    print("[*] Attempting to ingest AWS resources into Neo4j...")
+    with driver.session() as session:
+        ingestor = Neo4jIngestor(session, args.batch_size)
+        if args.incremental:
+            with metrics.timer("stage.incremental_sync"):
+                sync_summary = sync_incrementally(ingestor, aws_resources, RelationshipBuilder(aws_resources, args.collapse_actions), collected_scopes)
+            print(f"[*] Incremental sync: {sync_summary}")
+        else:
+            sink = TeeIngestor(ingestor, reachability_index) if reachability_index is not None else ingestor
+            with metrics.timer("stage.ingest_nodes"):
+                for aws_resource_category in aws_resources:
+                    for resource_arn in aws_resources[aws_resource_category]:
+                        aws_resources[aws_resource_category][resource_arn].create_neo4j_node(sink)
+                sink.flush()
+
+            with metrics.timer("stage.ingest_relationships"):
+                RelationshipBuilder(aws_resources, args.collapse_actions).build(sink)
+                sink.flush()
+    print(f"[*] Neo4j ingestion complete! ({ingestor.transactions} transactions)")
+
+if args.reachability_index is not None:
+    print("[*] Attempting to compute what every AWS resource can transitively reach...")
+    if reachability_index is None:
+        reachability_index = build_reachability_index(aws_resources, args.collapse_actions)
+    reachability: Reachability = reachability_index.compute()
+    reachability.save(args.reachability_index)
+    print(f"[*] Reachability index written to {args.reachability_index} ({len(reachability.nodes)} resources, {len(reachability.members)} strongly connected components)")
+    if write_to_neo4j:
+        with driver.session() as session, metrics.timer("stage.ingest_reachability"):
+            ingestor = Neo4jIngestor(session, args.batch_size)
+            reachability.write_reach_counts(ingestor)
+            if args.can_reach_edges:
+                can_reach_count: int = reachability.write_can_reach(ingestor)
+                print(f"[*] {can_reach_count} CAN_REACH relationships written")
+
+if write_to_neo4j:
+    driver.close()
+
+if collector_timings:
+    print("[*] Collector timings:")
+    for collector_name in sorted(collector_timings, key=collector_timings.get, reverse=True):
+        print(f"    {collector_name}: {collector_timings[collector_name]:.2f}s")
+
+metrics.record("stage.total", time.perf_counter() - run_start)
+if profiler is not None:
+    profile_output: str = args.profile_output or ("aws-resource-mapper.prof" if args.profile == "cprofile" else "aws-resource-mapper.html")
+    profiler.stop(profile_output)
+    print(f"[*] Profile written to {profile_output}")
+if args.report_json is not None:
+    metrics.write_report(args.report_json, arguments={name: value for name, value in vars(args).items() if name != "user"}, resources={label: len(aws_resources[label]) for label in aws_resources})
+    print(f"[*] Run report written to {args.report_json}")
+if args.prometheus_textfile is not None:
+    metrics.write_prometheus(args.prometheus_textfile)
+    print(f"[*] Prometheus metrics written to {args.prometheus_textfile}")
@@ -0,0 +1,71 @@
+import argparse
+import random
+import re
+import time
+from typing import Dict, List
+
+from resources.arn_index import ArnIndex, compile_arn_pattern
+
+
+def generate_arns(size: int) -> Dict[str, dict]:
+    regions: List[str] = ["us-east-1", "us-west-2", "eu-west-1", "ap-southeast-2"]
+    accounts: List[str] = [f"{account:012d}" for account in range(1, 11)]
+    teams: List[str] = ["billing", "orders", "search", "users", "events", "audit"]
+    return {
+        f"arn:aws:dynamodb:{regions[i % len(regions)]}:{accounts[i % len(accounts)]}:table/{teams[i % len(teams)]}-{i:06d}": {}
+        for i in range(size)
+    }
+
+
+def generate_patterns(arns: Dict[str, dict], count: int) -> List[str]:
+    rng = random.Random(0)
+    samples: List[str] = rng.sample(list(arns), count)
+    patterns: List[str] = []
+    for i, arn in enumerate(samples):
+        prefix, table = arn.rsplit("/", 1)
+        if i % 3 == 0:
+            patterns.append(f"{prefix}/{table[:-2]}*")
+        elif i % 3 == 1:
+            patterns.append(f"arn:aws:dynamodb:*:*:table/{table[:-3]}*")
+        else:
+            patterns.append(f"{prefix}/{table.split('-')[0]}-*")
+    return patterns
+
+
+def naive_expand(pattern: str, arns: Dict[str, dict]) -> List[str]:
+
+    # The per-pattern regex scan that AWSResource.expand_arn used to do
+    regex: re.Pattern = re.compile(pattern.replace("/", "\\/").replace("*", ".*"))
+    return [arn for arn in arns if re.match(regex, arn)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare wildcard ARN expansion by regex scan against the ARN index")
+    parser.add_argument("--size", metavar="size", type=int, help="Number of synthetic ARNs", default=100000)
+    parser.add_argument("--patterns", metavar="patterns", type=int, help="Number of wildcard patterns to expand", default=50)
+    args = parser.parse_args()
+
+    arns: Dict[str, dict] = generate_arns(args.size)
+    patterns: List[str] = generate_patterns(arns, args.patterns)
+
+    start: float = time.perf_counter()
+    naive_matches: int = sum(len(naive_expand(pattern, arns)) for pattern in patterns)
+    naive_elapsed: float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = ArnIndex(arns)
+    build_elapsed: float = time.perf_counter() - start
+
+    compile_arn_pattern.cache_clear()
+    start = time.perf_counter()
+    indexed_matches: int = sum(len(index.match(pattern)) for pattern in patterns)
+    indexed_elapsed: float = time.perf_counter() - start
+
+    print(f"[*] {args.size} ARNs, {len(patterns)} wildcard patterns")
+    print(f"    regex scan: {naive_elapsed:.3f}s ({naive_matches} matches)")
+    print(f"    ARN index:  {indexed_elapsed:.3f}s ({indexed_matches} matches), built in {build_elapsed:.3f}s")
+    print(f"    speedup:    {naive_elapsed / max(indexed_elapsed, 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
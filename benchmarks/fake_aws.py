@@ -0,0 +1,295 @@
+import json
+import re
+import threading
+import time
+from typing import Dict, List
+
+from botocore.exceptions import ClientError
+
+
+PAGINATED_OPERATIONS: Dict[str, str] = {
+    "GetDatabases": "DatabaseList",
+    "GetTables": "TableList",
+    "ListFunctions": "Functions",
+    "ListKeys": "Keys",
+    "ListQueues": "QueueUrls",
+    "ListRoles": "Roles",
+    "ListSubscriptions": "Subscriptions",
+    "ListSubscriptionsByTopic": "Subscriptions",
+    "ListTables": "TableNames",
+    "ListTopics": "Topics",
+}
+
+# Operations without a page size parameter, whose pages are always this size, truncating unpaginated calls too
+FIXED_PAGE_SIZES: Dict[str, int] = {
+    "ListSubscriptions": 100,
+    "ListSubscriptionsByTopic": 100,
+    "ListTopics": 100,
+}
+
+
+class SyntheticEstate:
+
+    def __init__(
+        self,
+        account_id: str = "123456789012",
+        region: str = "us-east-1",
+        lambdas: int = 1000,
+        roles: int = 50,
+        policies_per_role: int = 3,
+        statements_per_policy: int = 4,
+        tables: int = 1000,
+        queues: int = 500,
+        buckets: int = 200,
+        keys: int = 50,
+        glue_databases: int = 20,
+        glue_tables_per_database: int = 100,
+        topics: int = 100,
+        subscriptions_per_topic: int = 20,
+        latency: float = 0.0
+    ) -> None:
+        self.account_id: str = account_id
+        self.region: str = region
+        self.latency: float = latency
+        arn_prefix: str = f"{region}:{account_id}"
+
+        self.tables: List[str] = [f"team-{i % 20}-table-{i}" for i in range(tables)]
+        self.queues: List[str] = [f"team-{i % 20}-queue-{i}" for i in range(queues)]
+        self.buckets: List[str] = [f"team-{i % 20}-bucket-{i}" for i in range(buckets)]
+        self.keys: List[str] = [f"{i:08d}-0000-0000-0000-000000000000" for i in range(keys)]
+        self.glue_databases: List[str] = [f"database_{i}" for i in range(glue_databases)]
+        self.glue_tables: Dict[str, List[str]] = {
+            database: [f"table_{i}" for i in range(glue_tables_per_database)]
+            for database in self.glue_databases
+        }
+        self.roles: List[str] = [f"lambda-role-{i}" for i in range(roles)]
+        self.functions: List[str] = [f"function-{i}" for i in range(lambdas)]
+        self.topics: List[str] = [f"arn:aws:sns:{arn_prefix}:topic-{i}" for i in range(topics)]
+
+        # Wildcard-heavy statements: exact ARNs mixed with prefix wildcards and bare "*"
+        self.role_policies: Dict[str, Dict[str, List[dict]]] = {}
+        for r, role in enumerate(self.roles):
+            self.role_policies[role] = {}
+            for p in range(policies_per_role):
+                statements: List[dict] = []
+                for s in range(statements_per_policy):
+                    team: int = (r + p + s) % 20
+                    kind: int = (p * statements_per_policy + s) % 5
+                    if kind == 0:
+                        statements.append({"Effect": "Allow", "Action": ["dynamodb:GetItem", "dynamodb:PutItem"], "Resource": f"arn:aws:dynamodb:{arn_prefix}:table/team-{team}-*"})
+                    elif kind == 1:
+                        statements.append({"Effect": "Allow", "Action": "sqs:*", "Resource": [f"arn:aws:sqs:{arn_prefix}:team-{team}-*", f"arn:aws:sqs:{arn_prefix}:{self.queues[(r + s) % max(1, queues)] if queues else 'none'}"]})
+                    elif kind == 2:
+                        statements.append({"Effect": "Allow", "Action": ["s3:GetObject", "s3:PutObject"], "Resource": f"arn:aws:s3:::team-{team}-bucket-*/*"})
+                    elif kind == 3:
+                        statements.append({"Effect": "Allow", "Action": ["glue:GetTable", "glue:GetTables"], "Resource": f"arn:aws:glue:{arn_prefix}:table/database_{team % max(1, glue_databases)}/*"})
+                    else:
+                        statements.append({"Effect": "Allow", "Action": ["logs:CreateLogStream", "logs:PutLogEvents"], "Resource": "*"})
+                self.role_policies[role][f"policy-{p}"] = statements
+
+        self.function_roles: Dict[str, str] = {function: self.roles[i % roles] for i, function in enumerate(self.functions)}
+        self.event_source_mappings: Dict[str, List[dict]] = {
+            function: [{
+                "UUID": f"{i:08d}-1111-1111-1111-111111111111",
+                "EventSourceArn": f"arn:aws:sqs:{arn_prefix}:{self.queues[i % queues]}",
+                "State": "Enabled",
+            }] if queues and i % 3 == 0 else []
+            for i, function in enumerate(self.functions)
+        }
+        self.subscriptions: Dict[str, List[dict]] = {
+            topic: [{
+                "SubscriptionArn": f"{topic}:{s:08d}",
+                "TopicArn": topic,
+                "Protocol": "lambda",
+                "Endpoint": f"arn:aws:lambda:{arn_prefix}:function:{self.functions[(t * subscriptions_per_topic + s) % lambdas]}",
+            } for s in range(subscriptions_per_topic)] if lambdas else []
+            for t, topic in enumerate(self.topics)
+        }
+
+    def size(self) -> int:
+        return (
+            len(self.tables) + len(self.queues) + len(self.buckets) + len(self.keys) + len(self.roles) + len(self.functions)
+            + len(self.topics) + 1 + len(self.glue_databases) + sum(len(tables) for tables in self.glue_tables.values())
+        )
+
+
+class FakeClientMeta:
+
+    def __init__(self, region_name: str) -> None:
+        self.region_name: str = region_name
+
+
+class FakePageIterator:
+
+    def __init__(self, client, operation_name: str, params: dict, pagination_config: dict) -> None:
+        self.client = client
+        self.operation_name: str = operation_name
+        self.params: dict = params
+        if operation_name in FIXED_PAGE_SIZES and "PageSize" in pagination_config:
+            raise ValueError(f"PageSize isn't supported for {operation_name}")
+        self.page_size: int = None if operation_name in FIXED_PAGE_SIZES else pagination_config.get("PageSize", 50)
+        self.max_items: int = pagination_config.get("MaxItems")
+        self.offset: int = int(pagination_config.get("StartingToken") or 0)
+        self.resume_token: str = None
+
+    def __iter__(self):
+        total_items: int = 0
+        while True:
+            params: dict = dict(self.params, NextToken=self.offset)
+            if self.page_size is not None:
+                params["MaxResults"] = self.page_size
+            page: dict = self.client._make_api_call(self.operation_name, params)
+            total_items += len(page[PAGINATED_OPERATIONS[self.operation_name]])
+            yield page
+            if page.get("NextToken") is None:
+                break
+            self.offset = page["NextToken"]
+            if self.max_items is not None and total_items >= self.max_items:
+                self.resume_token = str(self.offset)
+                break
+
+
+class FakePaginator:
+
+    def __init__(self, client, operation_name: str) -> None:
+        self.client = client
+        self.operation_name: str = operation_name
+
+    def paginate(self, PaginationConfig: dict = None, **params) -> FakePageIterator:
+        return FakePageIterator(self.client, self.operation_name, params, PaginationConfig or {})
+
+
+class FakeClient:
+
+    def __init__(self, estate: SyntheticEstate, service_name: str, region_name: str, counters: Dict[str, int], lock: threading.Lock) -> None:
+        self.estate: SyntheticEstate = estate
+        self.service_name: str = service_name
+        self.meta = FakeClientMeta(region_name)
+        self.counters: Dict[str, int] = counters
+        self.lock: threading.Lock = lock
+
+    def _make_api_call(self, operation_name: str, api_params: dict) -> dict:
+        with self.lock:
+            self.counters[operation_name] = self.counters.get(operation_name, 0) + 1
+        if self.estate.latency:
+            time.sleep(self.estate.latency)
+        offset: int = api_params.pop("NextToken", None)
+        page_size: int = api_params.pop("MaxResults", None) or FIXED_PAGE_SIZES.get(operation_name)
+        response: dict = getattr(self, operation_name)(**api_params)
+
+        # Every paginated operation pages the same way, with a numeric offset standing in for the real token
+        if operation_name in PAGINATED_OPERATIONS and page_size is not None:
+            result_key: str = PAGINATED_OPERATIONS[operation_name]
+            items: list = response[result_key]
+            offset = offset or 0
+            response[result_key] = items[offset:offset + page_size]
+            response["NextToken"] = offset + page_size if offset + page_size < len(items) else None
+        return response
+
+    def get_paginator(self, operation_name: str) -> FakePaginator:
+        return FakePaginator(self, snake_to_pascal(operation_name))
+
+    def __getattr__(self, name: str):
+        operation_name: str = snake_to_pascal(name)
+        if not hasattr(type(self), operation_name):
+            raise AttributeError(name)
+        return lambda **api_params: self._make_api_call(operation_name, api_params)
+
+    def error(self, code: str, operation_name: str) -> ClientError:
+        return ClientError({"Error": {"Code": code, "Message": code}}, operation_name)
+
+    # STS
+    def GetCallerIdentity(self) -> dict:
+        return {"Account": self.estate.account_id}
+
+    # DynamoDB
+    def ListTables(self) -> dict:
+        return {"TableNames": list(self.estate.tables)}
+
+    def DescribeTable(self, TableName: str) -> dict:
+        return {"Table": {"TableName": TableName, "TableArn": f"arn:aws:dynamodb:{self.meta.region_name}:{self.estate.account_id}:table/{TableName}"}}
+
+    # Glue
+    def GetDatabases(self) -> dict:
+        return {"DatabaseList": [{"Name": database, "Description": ""} for database in self.estate.glue_databases]}
+
+    def GetTables(self, DatabaseName: str) -> dict:
+        return {"TableList": [{"Name": table, "DatabaseName": DatabaseName} for table in self.estate.glue_tables[DatabaseName]]}
+
+    # IAM
+    def ListRoles(self) -> dict:
+        return {"Roles": [{"RoleName": role, "Arn": f"arn:aws:iam::{self.estate.account_id}:role/{role}"} for role in self.estate.roles]}
+
+    def ListRolePolicies(self, RoleName: str) -> dict:
+        return {"PolicyNames": [name for name in self.estate.role_policies[RoleName] if name != "policy-0"]}
+
+    def GetRolePolicy(self, RoleName: str, PolicyName: str) -> dict:
+        return {"PolicyDocument": {"Version": "2012-10-17", "Statement": json.loads(json.dumps(self.estate.role_policies[RoleName][PolicyName]))}}
+
+    def ListAttachedRolePolicies(self, RoleName: str) -> dict:
+        return {"AttachedPolicies": [{"PolicyName": "policy-0", "PolicyArn": f"arn:aws:iam::{self.estate.account_id}:policy/{RoleName}/policy-0"}]}
+
+    def GetPolicy(self, PolicyArn: str) -> dict:
+        return {"Policy": {"PolicyName": "policy-0", "Arn": PolicyArn, "DefaultVersionId": "v1"}}
+
+    def GetPolicyVersion(self, PolicyArn: str, VersionId: str) -> dict:
+        role: str = PolicyArn.split("/")[-2]
+        return {"PolicyVersion": {"VersionId": VersionId, "Document": {"Statement": json.loads(json.dumps(self.estate.role_policies[role]["policy-0"]))}}}
+
+    # KMS
+    def ListKeys(self) -> dict:
+        return {"Keys": [{"KeyId": key, "KeyArn": f"arn:aws:kms:{self.meta.region_name}:{self.estate.account_id}:key/{key}"} for key in self.estate.keys]}
+
+    # Lambda
+    def ListFunctions(self) -> dict:
+        return {"Functions": [{
+            "FunctionName": function,
+            "FunctionArn": f"arn:aws:lambda:{self.meta.region_name}:{self.estate.account_id}:function:{function}",
+            "Runtime": "python3.8",
+            "Role": f"arn:aws:iam::{self.estate.account_id}:role/{self.estate.function_roles[function]}",
+        } for function in self.estate.functions]}
+
+    def ListEventSourceMappings(self, FunctionName: str) -> dict:
+        return {"EventSourceMappings": [dict(mapping) for mapping in self.estate.event_source_mappings[FunctionName]]}
+
+    # S3
+    def ListBuckets(self) -> dict:
+        return {"Buckets": [{"Name": bucket} for bucket in self.estate.buckets]}
+
+    def GetBucketPolicy(self, Bucket: str) -> dict:
+        if int(Bucket.rsplit("-", 1)[-1]) % 2:
+            raise self.error("NoSuchBucketPolicy", "GetBucketPolicy")
+        return {"Policy": json.dumps({"Statement": [{"Effect": "Allow", "Principal": "*", "Action": "s3:GetObject", "Resource": f"arn:aws:s3:::{Bucket}/*"}]})}
+
+    # SNS
+    def ListTopics(self) -> dict:
+        return {"Topics": [{"TopicArn": topic} for topic in self.estate.topics]}
+
+    def ListSubscriptions(self) -> dict:
+        return {"Subscriptions": [dict(subscription) for topic in self.estate.topics for subscription in self.estate.subscriptions[topic]]}
+
+    def ListSubscriptionsByTopic(self, TopicArn: str) -> dict:
+        return {"Subscriptions": [dict(subscription) for subscription in self.estate.subscriptions[TopicArn]]}
+
+    # SQS
+    def ListQueues(self) -> dict:
+        return {"QueueUrls": [f"https://sqs.{self.meta.region_name}.amazonaws.com/{self.estate.account_id}/{queue}" for queue in self.estate.queues]}
+
+    def GetQueueAttributes(self, QueueUrl: str, AttributeNames: List[str]) -> dict:
+        return {"Attributes": {"QueueArn": f"arn:aws:sqs:{self.meta.region_name}:{self.estate.account_id}:{QueueUrl.rsplit('/', 1)[-1]}"}}
+
+
+class FakeSession:
+
+    def __init__(self, estate: SyntheticEstate, counters: Dict[str, int], lock: threading.Lock) -> None:
+        self.estate: SyntheticEstate = estate
+        self.region_name: str = estate.region
+        self.counters: Dict[str, int] = counters
+        self.lock: threading.Lock = lock
+
+    def client(self, service_name: str, config=None) -> FakeClient:
+        return FakeClient(self.estate, service_name, self.region_name, self.counters, self.lock)
+
+
+def snake_to_pascal(name: str) -> str:
+    return re.sub(r"(?:^|_)([a-z])", lambda match: match.group(1).upper(), name)
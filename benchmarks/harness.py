@@ -0,0 +1,172 @@
+import argparse
+import json
+import resource
+import threading
+import time
+from typing import Dict, List
+
+from benchmarks.fake_aws import FakeSession, SyntheticEstate
+from benchmarks.recording_neo4j import RecordingDriver
+from resources.call_scheduler import call_scheduler
+from resources.collection import CollectionTarget, collect_aws_resources
+from resources.concurrency import detail_calls
+from resources.ingestion import Neo4jIngestor, RelationshipRecorder
+from resources.metrics import metrics
+from resources.reachability import build_reachability_index
+from resources.registry import registry
+from resources.relationships import RelationshipBuilder
+
+
+class FakeCollectionTarget(CollectionTarget):
+
+    def __init__(self, estate: SyntheticEstate, api_calls: Dict[str, int]) -> None:
+        super().__init__(estate.account_id, estate.region)
+        self.estate: SyntheticEstate = estate
+        self.api_calls: Dict[str, int] = api_calls
+        self.lock = threading.Lock()
+
+    def create_session(self) -> FakeSession:
+        return FakeSession(self.estate, self.api_calls, self.lock)
+
+
+class StageReport:
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.api_calls: int = 0
+        self.statements: int = 0
+        self.transactions: int = 0
+        self.relationships: int = 0
+        self.wall_time: float = 0.0
+        self.peak_rss: int = 0
+
+    def to_dict(self) -> dict:
+        return dict(
+            name=self.name,
+            api_calls=self.api_calls,
+            statements=self.statements,
+            transactions=self.transactions,
+            relationships=self.relationships,
+            wall_time=self.wall_time,
+            peak_rss=self.peak_rss
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<14} {self.wall_time:>8.2f}s {self.api_calls:>10} {self.statements:>10} "
+            f"{self.transactions:>12} {self.relationships:>13} {self.peak_rss / 2 ** 10:>9.1f}"
+        )
+
+
+class Stage:
+
+    def __init__(self, name: str, api_calls: Dict[str, int], driver: RecordingDriver, reports: List[StageReport]) -> None:
+        self.report = StageReport(name)
+        self.api_calls: Dict[str, int] = api_calls
+        self.driver: RecordingDriver = driver
+        reports.append(self.report)
+
+    def __enter__(self) -> StageReport:
+        self.api_calls_before: int = sum(self.api_calls.values())
+        self.statements_before: int = self.driver.statements
+        self.transactions_before: int = self.driver.transactions
+        self.start: float = time.perf_counter()
+        return self.report
+
+    def __exit__(self, *exc_info) -> None:
+        self.report.wall_time = time.perf_counter() - self.start
+        self.report.api_calls = sum(self.api_calls.values()) - self.api_calls_before
+        self.report.statements = self.driver.statements - self.statements_before
+        self.report.transactions = self.driver.transactions - self.transactions_before
+
+        # ru_maxrss is the process high-water mark in KiB, so a stage only moves it by outgrowing its predecessors
+        self.report.peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(estate: SyntheticEstate, workers: int, batch_size: int, collapse_actions: bool = False) -> List[StageReport]:
+    aws_resources: Dict[str, Dict[str, dict]] = registry.empty_inventory()
+    collectors = [service.load_collector() for service in registry.select()]
+    global_collectors = [service.load_collector() for service in registry.select() if service.is_global]
+    api_calls: Dict[str, int] = {}
+    driver = RecordingDriver()
+    reports: List[StageReport] = []
+
+    with Stage("collect", api_calls, driver, reports):
+        collect_aws_resources(collectors, global_collectors, [FakeCollectionTarget(estate, api_calls)], aws_resources, workers)
+
+    # Wildcard expansion on its own, without any ingestion cost mixed in
+    with Stage("relationships", api_calls, driver, reports) as report:
+        recorder = RelationshipRecorder()
+        RelationshipBuilder(aws_resources, collapse_actions).build(recorder)
+        report.relationships = sum(len(relationships) for relationships in recorder.relationships.values())
+        del recorder
+
+    with Stage("reachability", api_calls, driver, reports):
+        build_reachability_index(aws_resources, collapse_actions).compute()
+
+    with driver.session() as session:
+        ingestor = Neo4jIngestor(session, batch_size)
+        with Stage("ingest-nodes", api_calls, driver, reports):
+            for aws_resource_category in aws_resources:
+                for resource_arn in aws_resources[aws_resource_category]:
+                    aws_resources[aws_resource_category][resource_arn].create_neo4j_node(ingestor)
+            ingestor.flush()
+
+        with Stage("ingest-edges", api_calls, driver, reports) as report:
+            RelationshipBuilder(aws_resources, collapse_actions).build(ingestor)
+            ingestor.flush()
+            report.relationships = reports[1].relationships
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the collection and ingestion path against a synthetic AWS estate and a recording Neo4j driver")
+    parser.add_argument("--lambdas", metavar="lambdas", type=int, help="Number of Lambda functions", default=1000)
+    parser.add_argument("--roles", metavar="roles", type=int, help="Number of distinct Lambda execution roles", default=50)
+    parser.add_argument("--policies", metavar="policies", type=int, help="Number of policies per execution role", default=3)
+    parser.add_argument("--statements", metavar="statements", type=int, help="Number of statements per policy", default=4)
+    parser.add_argument("--tables", metavar="tables", type=int, help="Number of DynamoDB tables", default=1000)
+    parser.add_argument("--queues", metavar="queues", type=int, help="Number of SQS queues", default=500)
+    parser.add_argument("--buckets", metavar="buckets", type=int, help="Number of S3 buckets", default=200)
+    parser.add_argument("--glue-databases", metavar="glue_databases", type=int, help="Number of Glue databases", default=20)
+    parser.add_argument("--glue-tables", metavar="glue_tables", type=int, help="Number of Glue tables per database", default=100)
+    parser.add_argument("--topics", metavar="topics", type=int, help="Number of SNS topics", default=100)
+    parser.add_argument("--subscriptions", metavar="subscriptions", type=int, help="Number of subscriptions per SNS topic", default=20)
+    parser.add_argument("--latency", metavar="latency", type=float, help="Seconds every fake AWS API call takes", default=0.0)
+    parser.add_argument("--workers", metavar="workers", type=int, help="Number of AWS resource collectors to run concurrently", default=4)
+    parser.add_argument("--detail-concurrency", metavar="detail_concurrency", type=int, help="Number of per-resource detail calls each collector keeps in flight", default=8)
+    parser.add_argument("--batch-size", metavar="batch_size", type=int, help="Number of nodes or relationships per transaction", default=1000)
+    parser.add_argument("--rate", metavar="rate", type=float, help="Per-service AWS API call rate limit, effectively unlimited by default", default=1e6)
+    parser.add_argument("--collapse-actions", action="store_true", help="Collapse Lambda relationships into one CAN_ACCESS relationship per target")
+    parser.add_argument("--json", metavar="json", type=str, help="File to write the stage reports to as JSON", default=None)
+    args = parser.parse_args()
+
+    call_scheduler.initial_rate = call_scheduler.max_rate = args.rate
+    detail_calls.concurrency = args.detail_concurrency
+    estate = SyntheticEstate(
+        lambdas=args.lambdas,
+        roles=args.roles,
+        policies_per_role=args.policies,
+        statements_per_policy=args.statements,
+        tables=args.tables,
+        queues=args.queues,
+        buckets=args.buckets,
+        glue_databases=args.glue_databases,
+        glue_tables_per_database=args.glue_tables,
+        topics=args.topics,
+        subscriptions_per_topic=args.subscriptions,
+        latency=args.latency
+    )
+    reports: List[StageReport] = run(estate, args.workers, args.batch_size, args.collapse_actions)
+
+    print(f"[*] Synthetic estate of {estate.size()} resources")
+    print(f"    {'stage':<14} {'wall':>9} {'api calls':>10} {'statements':>10} {'transactions':>12} {'relationships':>13} {'peak MiB':>9}")
+    for report in reports:
+        print(f"    {report}")
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"resources": estate.size(), "stages": [report.to_dict() for report in reports], **metrics.to_dict()}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from resources.dynamodb_table import DynamoDBTable
+from resources.lmbda import LambdaFunction
+from resources.policy_statements import statement_pool
+from resources.sqs_queue import SQSQueue
+
+
+class LegacyResource:
+
+    # The pre-__slots__ model: per-instance attr_map and __dict__, full payloads kept as collected
+    def __init__(self, resource_type: str, attr_map: Dict[str, str], resource: dict) -> None:
+        self.aws_resource_type = resource_type
+        self.should_dump_json = False
+        self.attr_map = dict(attr_map)
+        for attr in self.attr_map:
+            setattr(self, attr, resource[self.attr_map[attr]])
+        self.filename = f"aws-{resource_type}.json"
+        if "Policies" in resource:
+            self.policies = resource["Policies"]
+            self.triggers = resource["EventSourceMappings"]
+
+
+def role_policies(role: int, account: str) -> dict:
+
+    # Round-tripped through JSON so every role gets its own objects, like separate API responses would
+    return json.loads(json.dumps({
+        f"policy-{policy}": [
+            {
+                "Effect": "Allow",
+                "Action": ["dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:Query", "sqs:SendMessage"],
+                "Resource": [
+                    f"arn:aws:dynamodb:us-east-1:{account}:table/team-{role % 50}-*",
+                    f"arn:aws:sqs:us-east-1:{account}:queue-{role % 50}-{statement}",
+                ],
+            }
+            for statement in range(5)
+        ]
+        for policy in range(3)
+    }))
+
+
+def generate_payloads(size: int, roles: int, pool_documents: bool) -> List[dict]:
+    account: str = "123456789012"
+    documents: List[dict] = [role_policies(role, account) for role in range(roles)]
+    if pool_documents:
+        documents = [statement_pool.intern_policies(document) for document in documents]
+    payloads: List[dict] = []
+    for i in range(size):
+        if i % 5 == 0:
+            payloads.append({
+                "Type": "Lambda",
+                "FunctionName": f"function-{i}",
+                "FunctionArn": f"arn:aws:lambda:us-east-1:{account}:function:function-{i}",
+                "Runtime": "python3.8",
+                "Policies": documents[i % roles],
+                "EventSourceMappings": [{
+                    "UUID": f"{i:08d}-0000-0000-0000-000000000000",
+                    "BatchSize": 10,
+                    "MaximumBatchingWindowInSeconds": 0,
+                    "EventSourceArn": f"arn:aws:sqs:us-east-1:{account}:queue-{i % 50}-0",
+                    "FunctionArn": f"arn:aws:lambda:us-east-1:{account}:function:function-{i}",
+                    "LastModified": "2021-03-01T00:00:00",
+                    "State": "Enabled",
+                    "StateTransitionReason": "USER_INITIATED",
+                    "FunctionResponseTypes": [],
+                }],
+            })
+        elif i % 5 in (1, 2):
+            payloads.append({
+                "Type": "DynamoDBTable",
+                "TableName": f"team-{i % 50}-{i}",
+                "TableArn": f"arn:aws:dynamodb:us-east-1:{account}:table/team-{i % 50}-{i}",
+            })
+        else:
+            payloads.append({
+                "Type": "SQSQueue",
+                "QueueArn": f"arn:aws:sqs:us-east-1:{account}:queue-{i % 50}-{i}",
+            })
+    return payloads
+
+
+def build_legacy(payload: dict) -> LegacyResource:
+    attr_maps: Dict[str, Dict[str, str]] = {
+        "Lambda": LambdaFunction.attr_map,
+        "DynamoDBTable": DynamoDBTable.attr_map,
+        "SQSQueue": SQSQueue.attr_map,
+    }
+    return LegacyResource(payload["Type"], attr_maps[payload["Type"]], payload)
+
+
+def build_compact(payload: dict):
+    resource_classes = {
+        "Lambda": LambdaFunction,
+        "DynamoDBTable": DynamoDBTable,
+        "SQSQueue": SQSQueue,
+    }
+    return resource_classes[payload["Type"]](payload)
+
+
+def measure(size: int, roles: int, build: Callable, pool_documents: bool) -> (int, float):
+
+    # Payloads are generated inside the trace and dropped as soon as they are converted, like a collector would.
+    # Functions sharing a role share its policy documents, as they do behind IAMPolicyResolver
+    gc.collect()
+    tracemalloc.start()
+    start: float = time.perf_counter()
+    payloads: List[dict] = generate_payloads(size, roles, pool_documents)
+    inventory: list = []
+    while payloads:
+        inventory.append(build(payloads.pop()))
+    gc.collect()
+    elapsed: float = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the in-memory footprint of the legacy and compact resource models")
+    parser.add_argument("--size", metavar="size", type=int, help="Number of synthetic resources", default=200000)
+    parser.add_argument("--roles", metavar="roles", type=int, help="Number of distinct Lambda execution roles", default=200)
+    args = parser.parse_args()
+
+    legacy_bytes, legacy_elapsed = measure(args.size, args.roles, build_legacy, False)
+    compact_bytes, compact_elapsed = measure(args.size, args.roles, build_compact, True)
+
+    print(f"[*] {args.size} resources, {args.roles} Lambda execution roles")
+    print(f"    legacy model:  {legacy_bytes / 2 ** 20:.1f} MiB ({legacy_elapsed:.2f}s)")
+    print(f"    compact model: {compact_bytes / 2 ** 20:.1f} MiB ({compact_elapsed:.2f}s)")
+    print(f"    ratio:         {compact_bytes / legacy_bytes:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import getpass
+import statistics
+import time
+from typing import List
+
+from neo4j import GraphDatabase
+
+from resources.cypher import escape_identifier
+from resources.ingestion import Neo4jIngestor
+from resources.neo4j_schema import ensure_schema, schema_rule_name, verify_schema
+
+
+# Scratch labels, so the benchmark never touches nodes the mapper wrote
+SOURCE_LABEL: str = "MergeBenchmarkSource"
+DST_LABEL: str = "MergeBenchmarkTarget"
+
+
+def drop_schema(session) -> None:
+    for label in (SOURCE_LABEL, DST_LABEL):
+        name: str = escape_identifier(schema_rule_name(label))
+        for statement in (f"DROP CONSTRAINT {name} IF EXISTS", f"DROP INDEX {name} IF EXISTS"):
+            session.run(statement).consume()
+
+
+def clear(session) -> None:
+    for label in (SOURCE_LABEL, DST_LABEL):
+        while session.run(f"MATCH (n:{escape_identifier(label)}) WITH n LIMIT 10000 DETACH DELETE n RETURN count(n) AS deleted").single()["deleted"]:
+            pass
+
+
+def populate(ingestor: Neo4jIngestor, nodes: int) -> None:
+
+    # The nodes are known to be new, so they're created outright. Merging them before any schema exists would
+    # scan the label once per node
+    for label, arn_format in (
+        (SOURCE_LABEL, "arn:aws:lambda:us-east-1:123456789012:function:function-{}"),
+        (DST_LABEL, "arn:aws:dynamodb:us-east-1:123456789012:table/table-{}"),
+    ):
+        query: str = f"UNWIND $rows AS row CREATE (n:{escape_identifier(label)} {{arn: row.arn}})"
+        for start in range(0, nodes, ingestor.batch_size):
+            ingestor.write(query, [{"arn": arn_format.format(i)} for i in range(start, min(start + ingestor.batch_size, nodes))])
+
+
+def measure(ingestor: Neo4jIngestor, nodes: int, batches: int, batch_size: int) -> List[float]:
+
+    # Batches only go out on the timed flush, never from add_relationship while they're being filled
+    ingestor.batch_size = batch_size + 1
+    latencies: List[float] = []
+    for batch in range(batches):
+        for i in range(batch_size):
+            n: int = (batch * batch_size + i) * 7919 % nodes
+            ingestor.add_relationship(
+                SOURCE_LABEL, f"arn:aws:lambda:us-east-1:123456789012:function:function-{n}",
+                "DYNAMODB_GETITEM",
+                DST_LABEL, f"arn:aws:dynamodb:us-east-1:123456789012:table/table-{(n + batch) % nodes}"
+            )
+        start: float = time.perf_counter()
+        ingestor.flush()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: List[float], batch_size: int) -> None:
+    print(
+        f"    {name:<16} median {statistics.median(latencies) * 1000:>9.1f} ms/batch, "
+        f"{batch_size / statistics.median(latencies):>10.0f} MERGEs/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare relationship MERGE latency against a live Neo4j with and without an index on arn")
+    parser.add_argument("--url", metavar="url", type=str, help="URL of a scratch Neo4j Database", default="bolt://localhost:7687")
+    parser.add_argument("--user", metavar="user", type=str, help="Neo4j user", default="neo4j")
+    parser.add_argument("--nodes", metavar="nodes", type=int, help="Number of nodes per label", default=100000)
+    parser.add_argument("--batches", metavar="batches", type=int, help="Number of relationship batches to time", default=5)
+    parser.add_argument("--batch-size", metavar="batch_size", type=int, help="Number of relationships per batch", default=1000)
+    args = parser.parse_args()
+    password: str = getpass.getpass(f"[*] Password of Neo4j user {args.user}: ")
+
+    driver = GraphDatabase.driver(args.url, auth=(args.user, password))
+    with driver.session() as session:
+        ingestor = Neo4jIngestor(session, 10000)
+        drop_schema(session)
+        clear(session)
+        print(f"[*] Writing {args.nodes} nodes per label...")
+        populate(ingestor, args.nodes)
+
+        print(f"[*] {args.batches} batches of {args.batch_size} relationship MERGEs over {2 * args.nodes} nodes")
+        report("without schema", measure(ingestor, args.nodes, args.batches, args.batch_size), args.batch_size)
+
+        ensure_schema(session, [SOURCE_LABEL, DST_LABEL])
+        unindexed_labels: List[str] = verify_schema(session, [SOURCE_LABEL, DST_LABEL])
+        if unindexed_labels:
+            print(f"[!] No online index on arn for: {', '.join(unindexed_labels)}")
+        report("with schema", measure(ingestor, args.nodes, args.batches, args.batch_size), args.batch_size)
+
+        clear(session)
+        drop_schema(session)
+    driver.close()
+
+
+if __name__ == "__main__":
+    main()
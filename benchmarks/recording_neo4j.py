@@ -0,0 +1,73 @@
+import threading
+from typing import Dict, List
+
+
+class RecordingResult:
+
+    def __init__(self) -> None:
+        self.records: List = []
+
+        # Nothing is planned, so there's no planning time to report
+        self.result_available_after: int = None
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def consume(self):
+        return self
+
+
+class RecordingTransaction:
+
+    def __init__(self, driver) -> None:
+        self.driver = driver
+
+    def run(self, query: str, **parameters) -> RecordingResult:
+        self.driver.record(query, parameters)
+        return RecordingResult()
+
+
+class RecordingSession:
+
+    def __init__(self, driver) -> None:
+        self.driver = driver
+
+    def write_transaction(self, transaction_function, *args):
+        self.driver.transactions += 1
+        return transaction_function(RecordingTransaction(self.driver), *args)
+
+    def read_transaction(self, transaction_function, *args):
+        self.driver.transactions += 1
+        return transaction_function(RecordingTransaction(self.driver), *args)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class RecordingDriver:
+
+    # Stands in for a neo4j driver: counts what would have gone over Bolt without a database behind it
+    def __init__(self) -> None:
+        self.transactions: int = 0
+        self.statements: int = 0
+        self.rows: int = 0
+        self.queries: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def record(self, query: str, parameters: dict) -> None:
+        with self.lock:
+            self.statements += 1
+            self.rows += len(parameters.get("rows", ()))
+            self.queries[query] = self.queries.get(query, 0) + 1
+
+    def session(self) -> RecordingSession:
+        return RecordingSession(self)
+
+    def close(self) -> None:
+        pass
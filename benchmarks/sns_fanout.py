@@ -0,0 +1,61 @@
+import argparse
+import gc
+import threading
+import time
+import tracemalloc
+from typing import Dict, Tuple
+
+from benchmarks.fake_aws import FakeSession, SyntheticEstate
+from resources.call_scheduler import call_scheduler
+from resources.concurrency import detail_calls
+from resources.sns_topic import retrieve_sns_topics
+
+
+def measure(estate: SyntheticEstate, concurrency: int) -> Tuple[int, int, int, int, float]:
+
+    # Topics are consumed and dropped as they're yielded, like a pipelined run would, so the traced peak is
+    # what the collector itself holds on to
+    detail_calls.concurrency = concurrency
+    api_calls: Dict[str, int] = {}
+    topics: int = 0
+    subscriptions: int = 0
+    gc.collect()
+    tracemalloc.start()
+    start: float = time.perf_counter()
+    for sns_topic in retrieve_sns_topics(FakeSession(estate, api_calls, threading.Lock())):
+        topics += 1
+        subscriptions += len(sns_topic.subscriptions)
+    elapsed: float = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return topics, subscriptions, sum(api_calls.values()), peak, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Collect SNS topics with a large subscription fan-out from a synthetic estate")
+    parser.add_argument("--topics", metavar="topics", type=int, help="Number of SNS topics", default=1000)
+    parser.add_argument("--subscriptions", metavar="subscriptions", type=int, help="Number of subscriptions per SNS topic", default=150)
+    parser.add_argument("--latency", metavar="latency", type=float, help="Seconds every fake AWS API call takes", default=0.002)
+    parser.add_argument("--concurrency", metavar="concurrency", type=int, nargs="+", help="Detail call concurrencies to compare", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    call_scheduler.initial_rate = call_scheduler.max_rate = 1e6
+    estate = SyntheticEstate(
+        lambdas=1000,
+        tables=0,
+        queues=0,
+        buckets=0,
+        keys=0,
+        glue_databases=0,
+        topics=args.topics,
+        subscriptions_per_topic=args.subscriptions,
+        latency=args.latency
+    )
+    print(f"[*] {args.topics} SNS topics with {args.subscriptions} subscriptions each, {args.latency * 1000:.0f}ms per API call")
+    for concurrency in args.concurrency:
+        topics, subscriptions, api_calls, peak, elapsed = measure(estate, concurrency)
+        print(f"    concurrency {concurrency:>3}: {elapsed:6.2f}s, {api_calls} API calls, {topics} topics, {subscriptions} subscriptions, {peak / 2 ** 20:.1f} MiB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import bisect
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+
+@lru_cache(maxsize=4096)
+def compile_arn_pattern(pattern: str) -> re.Pattern:
+    return re.compile(".*".join(re.escape(part) for part in pattern.split("*")))
+
+
+def split_arn(arn: str) -> Tuple[str, str]:
+    elements: List[str] = arn.split(":", 5)
+    if len(elements) < 6:
+        return None, arn
+    return ":".join(elements[:5]) + ":", elements[5]
+
+
+class ArnIndex:
+
+    def __init__(self, arns: Iterable[str]) -> None:
+
+        # ARNs are bucketed by arn:partition:service:region:account and each bucket keeps its resource
+        # segments sorted, so a wildcard's literal prefix narrows the scan down to a contiguous range
+        self.arns: List[str] = []
+        self.buckets: Dict[str, List[str]] = {}
+        for arn in arns:
+            self.arns.append(arn)
+            prefix, resource = split_arn(arn)
+            if prefix is not None:
+                self.buckets.setdefault(prefix, []).append(resource)
+        for resources in self.buckets.values():
+            resources.sort()
+
+    def match(self, pattern: str) -> List[str]:
+        pattern_prefix, pattern_resource = split_arn(pattern)
+
+        # Patterns that aren't full ARNs fall back to a scan
+        if pattern_prefix is None:
+            regex: re.Pattern = compile_arn_pattern(pattern)
+            return [arn for arn in self.arns if regex.fullmatch(arn)]
+
+        if "*" in pattern_prefix:
+            prefix_regex: re.Pattern = compile_arn_pattern(pattern_prefix)
+            prefixes: List[str] = [prefix for prefix in self.buckets if prefix_regex.fullmatch(prefix)]
+        else:
+            prefixes: List[str] = [pattern_prefix] if pattern_prefix in self.buckets else []
+
+        literal: str = pattern_resource.split("*", 1)[0]
+        resource_regex: re.Pattern = compile_arn_pattern(pattern_resource)
+        matches: List[str] = []
+        for prefix in prefixes:
+            resources: List[str] = self.buckets[prefix]
+            for i in range(bisect.bisect_left(resources, literal), len(resources)):
+                if not resources[i].startswith(literal):
+                    break
+                if resource_regex.fullmatch(resources[i]):
+                    matches.append(prefix + resources[i])
+        return matches
+
+
+indexes: Dict[int, Tuple[dict, int, ArnIndex]] = {}
+indexes_lock = threading.Lock()
+
+
+def get_arn_index(resources: Dict[str, dict]) -> ArnIndex:
+
+    # Indexes are rebuilt whenever the resource category changes size, and the cache holds on to the
+    # category itself so its id can't be reused by another dict
+    with indexes_lock:
+        cached: Tuple[dict, int, ArnIndex] = indexes.get(id(resources))
+        if cached is None or cached[1] != len(resources):
+            cached = (resources, len(resources), ArnIndex(resources))
+            indexes[id(resources)] = cached
+        return cached[2]
@@ -1,52 +1,80 @@
+import hashlib
 import json
-import re
+import sys
 from typing import Dict, List, Tuple
 
+from resources.arn_index import get_arn_index
+from resources.metrics import metrics
+
+
+# Relationships to ARNs that can't be resolved to a collected resource end up on these placeholder labels
+PLACEHOLDER_LABELS: List[str] = ["WILDCARD_AWS_RESOURCE", "UNKNOWN_AWS_RESOURCE"]
+
 
 class AWSResource:
 
-    def __init__(self, resource_type: str, resource: dict, should_dump_json: bool = False) -> None:
-        self.aws_resource_type: str = resource_type
-        self.should_dump_json = should_dump_json
-        assert self.attr_map is not None and isinstance(self.attr_map, dict)
+    __slots__ = ("account_id", "region")
+    aws_resource_type: str = None
+    attr_map: Dict[str, str] = {}
+
+    def __init__(self, resource: dict) -> None:
+        self.account_id: str = None
+        self.region: str = None
         for attr in self.attr_map:
-            setattr(self, attr, resource[self.attr_map[attr]])
-        self.filename = f"aws-{resource_type}.json"
+            value = resource[self.attr_map[attr]]
+            setattr(self, attr, sys.intern(value) if isinstance(value, str) else value)
 
-    def __del__(self) -> None:
-        if self.should_dump_json:
-            self.dump_json()
+    def create_neo4j_node(self, ingestor) -> None:
+        ingestor.add_node(self.aws_resource_type, self.node_properties())
 
-    def create_neo4j_node(self, tx) -> None:
-        tx.run(
-            f"CREATE (n:{self.aws_resource_type}) " + " ".join([f"SET n.{attr} = ${attr} " for attr in self.attr_map]) + "RETURN n",
-            **{attr: getattr(self, attr) for attr in self.attr_map}
-        )
+    def node_properties(self) -> dict:
+        properties: dict = {attr: getattr(self, attr) for attr in self.attr_map}
+        if self.account_id is not None:
+            properties["account_id"] = self.account_id
+        if self.region is not None:
+            properties["region"] = self.region
+        properties["fingerprint"] = self.fingerprint()
+        return properties
 
-    def create_neo4j_relationships(self, tx, aws_resources: Dict[str, Dict[str, dict]]) -> None:
+    def to_dict(self) -> dict:
+        return {attr: getattr(self, attr) for attr in self.attr_map}
+
+    def to_record(self) -> dict:
+        return {self.attr_map[attr]: getattr(self, attr) for attr in self.attr_map}
+
+    def fingerprint(self) -> str:
+        document: dict = dict(self.to_dict(), account_id=self.account_id, region=self.region)
+        return hashlib.sha256(json.dumps(document, sort_keys=True, default=str).encode()).hexdigest()
+
+    def create_neo4j_relationships(self, ingestor, aws_resources: Dict[str, Dict[str, dict]]) -> None:
         pass
 
-    def create_neo4j_relationship(tx, source_arn: str, source_resource_type: str, relationship: str, dst_arn: str, dst_resource_type: str, extra: str = None) -> None:
-        source_resource_type: str = source_resource_type.replace("-", "_")
-        relationship: str = relationship.replace(":", "_").replace("-", "_").replace("*", "_WILDCARD_").upper()
-        dst_resource_type: str = dst_resource_type.replace("-", "_")
-        tx.run(
-            f"MERGE (src:{source_resource_type} {{arn: '{source_arn}'}}) "
-            "RETURN src.arn"
-        )
-        tx.run(
-            f"MERGE (dst:{dst_resource_type} {{arn: '{dst_arn}'}}) "
-            "RETURN dst.arn"
-        )
-        tx.run(
-            f"MATCH (src:{source_resource_type}),(dst:{dst_resource_type}) "
-            "WHERE src.arn = $source_arn AND dst.arn = $dst_arn "
-            f"MERGE (src)-[r:{relationship} {{extra: '{extra if extra is not None else ''}'}}]->(dst) "
-            "RETURN src.arn, type(r), dst.arn",
-            source_arn=source_arn,
-            dst_arn=dst_arn
+    def needs_inventory(self) -> bool:
+        return False
+
+    def create_neo4j_relationship(ingestor, source_arn: str, source_resource_type: str, relationship: str, dst_arn: str, dst_resource_type: str, extra: str = None, owner: str = None) -> None:
+        ingestor.add_relationship(
+            AWSResource.label_name(source_resource_type),
+            source_arn,
+            AWSResource.relationship_type(relationship),
+            AWSResource.label_name(dst_resource_type),
+            dst_arn,
+            extra,
+            owner
         )
 
+    def label_name(resource_type: str) -> str:
+        return resource_type.replace("-", "_")
+
+    def relationship_type(relationship: str) -> str:
+        return relationship.replace(":", "_").replace("-", "_").replace("*", "_WILDCARD_").upper()
+
+    def is_wildcard_pattern(arn: str) -> bool:
+
+        # A bare "*" maps onto the wildcard placeholder, everything else with a wildcard is expanded against the inventory
+        return arn != "*" and "*" in arn
+
+    @metrics.timed("expand_arn")
     def expand_arn(arn: str, resources: Dict[str, dict]) -> List[str]:
 
         # If the ARN doesn't contain any wildcards, return it as is
@@ -54,9 +82,9 @@ class AWSResource:
             return [arn]
 
         # Return the ARN with wildcards, along with all existing ARNs in the resource category that match the pattern
-        regex: re.Pattern = re.compile(arn.replace("/", "\\/").replace("*", ".*"))
-        return [arn] + [resource_arn for resource_arn in resources if re.match(regex, resource_arn)]
+        return [arn] + get_arn_index(resources).match(arn)
 
+    @metrics.timed("extract_base_arns")
     def extract_base_arns(arn: str, aws_resources: Dict[str, Dict[str, dict]]) -> Tuple[List[str], str, str]:
         if arn == "*":
             return ["*"], "WILDCARD_AWS_RESOURCE", None
@@ -84,12 +112,10 @@ class AWSResource:
         if elements[2] == "glue":
             elements: List[str] = arn.split(":")
             if elements[5][:5] == "table":
-                regex: re.Pattern = re.compile(arn.replace("/", "\\/").replace("*", ".*"))
-                return [arn] + [glue_resource_arn for glue_resource_arn in aws_resources["GlueTable"] if re.match(regex, glue_resource_arn)], "GlueTable", None
+                return AWSResource.expand_arn(arn, aws_resources["GlueTable"]), "GlueTable", None
 
             if elements[5][:8] == "database":
-                regex: re.Pattern = re.compile(arn.replace("/", "\\/").replace("*", ".*"))
-                return [arn] + [glue_resource_arn for glue_resource_arn in aws_resources["GlueDatabase"] if re.match(regex, glue_resource_arn)], "GlueDatabase", None
+                return AWSResource.expand_arn(arn, aws_resources["GlueDatabase"]), "GlueDatabase", None
 
             return [arn], "GlueCatalog", None
 
@@ -118,15 +144,8 @@ class AWSResource:
             return resource_arn in aws_resources[resource_type]
         return False
 
-    def dump_json(self) -> None:
-        with open(self.filename, "a") as f:
-            f.write(self.__str__() + "\n")
-
     def __str__(self) -> str:
-        return json.dumps(
-            {attr: getattr(self, attr) for attr in self.attr_map},
-            default=str
-        )
+        return json.dumps(self.to_dict(), default=str)
 
     def __repr__(self) -> str:
         return self.__str__()
@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Generator, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as AWSConnectionError
+
+from resources.concurrency import detail_calls
+from resources.metrics import metrics
+
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "ProvisionedThroughputExceededException",
+    "SlowDown",
+}
+TRANSIENT_ERROR_CODES = {
+    "InternalError",
+    "InternalFailure",
+    "InternalServerError",
+    "ServiceUnavailable",
+    "RequestTimeout",
+    "RequestTimeoutException",
+}
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float) -> None:
+        self.rate: float = rate
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.tokens: float = 1.0
+        self.updated: float = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        waited: float = 0.0
+        while True:
+            with self.lock:
+                now: float = time.monotonic()
+                self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay: float = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self) -> None:
+
+        # Additive increase, multiplicative decrease
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+
+    def on_throttle(self) -> None:
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+
+class CallScheduler:
+
+    def __init__(
+        self,
+        max_retries: int = 8,
+        base_delay: float = 0.25,
+        max_delay: float = 20.0,
+        initial_rate: float = 20.0,
+        min_rate: float = 0.5,
+        max_rate: float = 100.0
+    ) -> None:
+        self.max_retries: int = max_retries
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.initial_rate: float = initial_rate
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+        self.calls: int = 0
+        self.retries: int = 0
+        self.throttles: int = 0
+        self.wait_time: float = 0.0
+        self.lock = threading.Lock()
+        self.account_context = threading.local()
+
+    @contextmanager
+    def for_account(self, account_id: str) -> Generator[None, None, None]:
+
+        # Clients created by this thread in the block are rate limited as the given account's
+        self.account_context.account_id = account_id
+        try:
+            yield
+        finally:
+            self.account_context.account_id = None
+
+    def current_account(self) -> str:
+        return getattr(self.account_context, "account_id", None)
+
+    def bucket(self, account_id: str, service_name: str, region_name: str) -> TokenBucket:
+
+        # AWS rate limits apply per account, so a throttle in one account doesn't slow down the others
+        with self.lock:
+            key: Tuple[str, str, str] = (account_id, service_name, region_name)
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.initial_rate, self.min_rate, self.max_rate)
+            return self.buckets[key]
+
+    def call(self, bucket: TokenBucket, make_api_call: Callable, service_name: str, operation_name: str, api_params: dict) -> dict:
+        metric_name: str = f"aws.{service_name}.{operation_name}"
+        attempt: int = 0
+        while True:
+            waited: float = bucket.acquire()
+            with self.lock:
+                self.calls += 1
+                self.wait_time += waited
+            try:
+                with metrics.timer(metric_name):
+                    response: dict = make_api_call(operation_name, api_params)
+            except ClientError as e:
+                error_code: str = e.response.get("Error", {}).get("Code")
+                status_code: int = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+                is_throttle: bool = error_code in THROTTLING_ERROR_CODES or status_code == 429
+                is_transient: bool = error_code in TRANSIENT_ERROR_CODES or status_code >= 500
+                if not (is_throttle or is_transient) or attempt >= self.max_retries:
+                    raise
+                if is_throttle:
+                    bucket.on_throttle()
+                    metrics.increment(f"{metric_name}.throttled")
+            except (AWSConnectionError, HTTPClientError):
+
+                # Connection failures and timeouts (EndpointConnectionError, ReadTimeoutError, ...), which
+                # botocore's own retries would otherwise have covered
+                if attempt >= self.max_retries:
+                    raise
+                is_throttle = False
+                metrics.increment(f"{metric_name}.connection_errors")
+            else:
+                bucket.on_success()
+                return response
+
+            # Full jitter exponential backoff
+            attempt += 1
+            delay: float = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            with self.lock:
+                self.retries += 1
+                self.throttles += 1 if is_throttle else 0
+                self.wait_time += delay
+            time.sleep(delay)
+
+    def wrap(self, client, service_name: str, account_id: str = None):
+
+        # Paginators and client methods all funnel through _make_api_call, so shadowing it on the
+        # instance puts every call this client makes behind the scheduler
+        bucket: TokenBucket = self.bucket(account_id or self.current_account(), service_name, client.meta.region_name)
+        make_api_call: Callable = client._make_api_call
+        client._make_api_call = lambda operation_name, api_params: self.call(bucket, make_api_call, service_name, operation_name, api_params)
+        return client
+
+    def __str__(self) -> str:
+        return f"{self.calls} calls, {self.retries} retries ({self.throttles} throttled), {self.wait_time:.2f}s waiting"
+
+
+call_scheduler = CallScheduler()
+
+
+def create_client(session: boto3.session.Session, service_name: str, concurrency: int = 0):
+
+    # Retries are left to the scheduler so throttles feed back into its rate limits. botocore keeps 10
+    # connections per client by default, concurrent detail calls, or the `concurrency` threads a collector
+    # shares the client between, would otherwise queue for them
+    max_pool_connections: int = max(10, detail_calls.concurrency, concurrency)
+    client = session.client(service_name, config=Config(retries={"max_attempts": 0}, max_pool_connections=max_pool_connections))
+    return call_scheduler.wrap(client, service_name)
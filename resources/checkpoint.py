@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Generator, List, Tuple
+
+from resources.metrics import metrics
+
+
+# Operations without a page size parameter (SNS listings, ...) are read this many items per call
+DEFAULT_PAGE_SIZE = 100
+
+
+class JobState:
+
+    def __init__(self, checkpoint: "Checkpoint", name: str) -> None:
+        self.checkpoint: "Checkpoint" = checkpoint
+        self.name: str = name
+        self.pages: Dict[str, List[Tuple[list, str]]] = {}
+        self.details: Dict[str, object] = {}
+        self.resources: List[Tuple[str, dict]] = []
+        self.finished: bool = False
+
+    def paginate(self, paginator, operation_name: str, result_key: str, page_size: int, params: dict) -> Generator[object, None, None]:
+        key: str = json.dumps([operation_name, params], sort_keys=True, default=str)
+        pages: List[Tuple[list, str]] = self.pages.setdefault(key, [])
+
+        # Pages listed by an earlier attempt are replayed, listing carries on from the token after the last one
+        token: str = None
+        for items, token in list(pages):
+            metrics.increment("checkpoint.pages_replayed")
+            yield from items
+            if token is None:
+                return
+        while True:
+
+            # One page per call, MaxItems makes botocore hand out the token to carry on from
+            config: dict = {"MaxItems": page_size or DEFAULT_PAGE_SIZE, "StartingToken": token}
+            if page_size is not None:
+                config["PageSize"] = page_size
+            page_iterator = paginator.paginate(PaginationConfig=config, **params)
+            items: list = [item for response in page_iterator for item in response.get(result_key, [])]
+            token = page_iterator.resume_token
+            pages.append((items, token))
+            self.checkpoint.append({"job": self.name, "page": key, "items": items, "next": token})
+            yield from items
+            if token is None:
+                return
+
+    def cached(self, function: Callable, key: Callable) -> Callable:
+
+        # Detail calls made by an earlier attempt are answered from the state file
+        def cached_function(item):
+            item_key: str = json.dumps(key(item), sort_keys=True, default=str)
+            if item_key in self.details:
+                metrics.increment("checkpoint.details_replayed")
+                return self.details[item_key]
+            result = self.details[item_key] = function(item)
+            self.checkpoint.append({"job": self.name, "detail": item_key, "result": result})
+            return result
+        return cached_function
+
+    def record_resource(self, aws_resource) -> None:
+        self.checkpoint.append({"job": self.name, "label": aws_resource.aws_resource_type, "record": aws_resource.to_record()})
+
+    def finish(self) -> None:
+        self.finished = True
+        self.checkpoint.append({"job": self.name, "finished": True})
+
+
+class Checkpoint:
+
+    # An append-only JSONL state file. Every line is one listed page, detail call result, collected resource
+    # or finished job, flushed as it's written, so a crash loses at most the line being written
+    def __init__(self, path: str, resume: bool = False) -> None:
+        self.path: str = path
+        self.jobs: Dict[str, JobState] = {}
+        self.lock = threading.Lock()
+        if resume:
+            self.load()
+
+        # Pages and detail call results are raw API responses, Lambda environment variables included
+        self.file = open(path, "a" if resume else "w", opener=lambda path, flags: os.open(path, flags, 0o600))
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                lines: List[str] = f.readlines()
+        except FileNotFoundError:
+            return
+        for number, line in enumerate(lines):
+            try:
+                entry: dict = json.loads(line)
+            except ValueError:
+                if number == len(lines) - 1:
+                    break  # the line being written when the run was interrupted
+                raise
+            job: JobState = self.job_state(entry["job"])
+            if "page" in entry:
+                job.pages.setdefault(entry["page"], []).append((entry["items"], entry["next"]))
+            elif "detail" in entry:
+                job.details[entry["detail"]] = entry["result"]
+            elif "started" in entry:
+                job.resources = []
+            elif "record" in entry:
+                job.resources.append((entry["label"], entry["record"]))
+            elif "finished" in entry:
+                job.finished = True
+
+    def job_state(self, name: str) -> JobState:
+        with self.lock:
+            if name not in self.jobs:
+                self.jobs[name] = JobState(self, name)
+            return self.jobs[name]
+
+    def append(self, entry: dict) -> None:
+        line: str = json.dumps(entry, default=str) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    @contextmanager
+    def job(self, name: str) -> Generator[JobState, None, None]:
+
+        # Resources recorded by an earlier, unfinished attempt are collected again by this one
+        state: JobState = self.job_state(name)
+        state.resources = []
+        self.append({"job": name, "started": True})
+        job_context.state = state
+        try:
+            yield state
+        finally:
+            job_context.state = None
+
+    def close(self) -> None:
+        self.file.close()
+
+
+job_context = threading.local()
+
+
+def current_job() -> JobState:
+    return getattr(job_context, "state", None)
+
+
+def in_current_job(function: Callable) -> Callable:
+
+    # Carries the calling thread's job over to a worker thread
+    state: JobState = current_job()
+
+    def job_function(*args, **kwargs):
+        job_context.state = state
+        try:
+            return function(*args, **kwargs)
+        finally:
+            job_context.state = None
+    return job_function
+
+
+def paginate(client, operation_name: str, result_key: str, page_size: int = None, **params) -> Generator[object, None, None]:
+    paginator = client.get_paginator(operation_name)
+    state: JobState = current_job()
+    if state is not None:
+        yield from state.paginate(paginator, operation_name, result_key, page_size, params)
+        return
+    config: dict = {"PageSize": page_size} if page_size is not None else {}
+    for response in paginator.paginate(PaginationConfig=config, **params):
+        yield from response.get(result_key, [])
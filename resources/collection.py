@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Generator, List, Set, Tuple
+
+import boto3
+
+from resources.aws_resource import AWSResource
+from resources.call_scheduler import call_scheduler, create_client
+from resources.checkpoint import Checkpoint
+from resources.metrics import metrics
+from resources.registry import registry
+
+
+Collector = Callable[[boto3.session.Session], Generator[AWSResource, None, None]]
+
+
+class CollectionTarget:
+
+    def __init__(self, account_id: str, region_name: str, profile_name: str = None, credentials: dict = None) -> None:
+        self.account_id: str = account_id
+        self.region_name: str = region_name
+        self.profile_name: str = profile_name
+        self.credentials: dict = credentials
+
+    def create_session(self) -> boto3.session.Session:
+
+        # boto3 sessions aren't thread-safe, so every collection job builds its own session and clients
+        if self.credentials is not None:
+            return boto3.session.Session(
+                aws_access_key_id=self.credentials["AccessKeyId"],
+                aws_secret_access_key=self.credentials["SecretAccessKey"],
+                aws_session_token=self.credentials["SessionToken"],
+                region_name=self.region_name
+            )
+        return boto3.session.Session(profile_name=self.profile_name, region_name=self.region_name)
+
+    def __str__(self) -> str:
+        return f"{self.account_id}/{self.region_name}"
+
+
+def resolve_collection_targets(profile_names: List[str], role_arns: List[str], region_names: List[str]) -> List[CollectionTarget]:
+
+    # Every profile and assumed role is a credential source, falling back to the default boto3 credentials
+    sources: List[Tuple[str, dict]] = [(profile_name, None) for profile_name in profile_names]
+    if role_arns:
+        sts = create_client(boto3.session.Session(), "sts")
+        for role_arn in role_arns:
+            response = sts.assume_role(RoleArn=role_arn, RoleSessionName="aws-resource-mapper")
+            sources.append((None, response["Credentials"]))
+    if not sources:
+        sources.append((None, None))
+
+    targets: List[CollectionTarget] = []
+    account_ids: Set[str] = set()
+    for profile_name, credentials in sources:
+        session: boto3.session.Session = CollectionTarget(None, None, profile_name, credentials).create_session()
+        account_id: str = create_client(session, "sts").get_caller_identity().get("Account")
+        if account_id in account_ids:
+            continue
+        account_ids.add(account_id)
+        for region_name in region_names or [session.region_name]:
+            targets.append(CollectionTarget(account_id, region_name, profile_name, credentials))
+    return targets
+
+
+class JobFinished:
+
+    def __init__(self, error: BaseException = None) -> None:
+        self.error: BaseException = error
+
+
+def collection_jobs(
+    collectors: List[Collector],
+    global_collectors: List[Collector],
+    targets: List[CollectionTarget]
+) -> List[Tuple[Collector, CollectionTarget, str, str]]:
+    jobs: List[Tuple[Collector, CollectionTarget, str, str]] = []
+    collected_accounts: Set[str] = set()
+    for target in targets:
+
+        # Global services are collected once per account rather than once per region
+        is_first_region: bool = target.account_id not in collected_accounts
+        collected_accounts.add(target.account_id)
+        for collector in collectors:
+            if collector in global_collectors:
+                if is_first_region:
+                    jobs.append((collector, target, "global", f"{collector.__name__} ({target.account_id}/global)"))
+            else:
+                jobs.append((collector, target, target.region_name, f"{collector.__name__} ({target})"))
+    return jobs
+
+
+def stream_aws_resources(
+    collectors: List[Collector],
+    global_collectors: List[Collector],
+    targets: List[CollectionTarget],
+    workers: int,
+    timings: Dict[str, float],
+    queue_size: int = 1000,
+    checkpoint: Checkpoint = None
+) -> Generator[AWSResource, None, None]:
+
+    # Collectors run on the worker pool and hand resources over through a bounded queue, so a slow
+    # consumer applies backpressure instead of letting the whole estate pile up in memory
+    results: queue.Queue = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def publish(aws_resource: AWSResource, target: CollectionTarget, region_name: str) -> None:
+        aws_resource.account_id = target.account_id
+        aws_resource.region = region_name
+        results.put(aws_resource)
+
+    def run_collection_job(collector: Collector, target: CollectionTarget, region_name: str, name: str) -> None:
+        start: float = time.perf_counter()
+        error: BaseException = None
+        collected: int = 0
+        try:
+            if checkpoint is None:
+                with call_scheduler.for_account(target.account_id):
+                    for aws_resource in collector(target.create_session()):
+                        if stopped.is_set():
+                            break
+                        publish(aws_resource, target, region_name)
+                        collected += 1
+            elif checkpoint.job_state(name).finished:
+
+                # Jobs an earlier run finished aren't collected again, their resources come from the state file
+                for label, record in checkpoint.job_state(name).resources:
+                    if stopped.is_set():
+                        break
+                    publish(registry.resource_class(label)(record), target, region_name)
+                    collected += 1
+                metrics.increment("checkpoint.jobs_replayed")
+            else:
+                with checkpoint.job(name) as job, call_scheduler.for_account(target.account_id):
+                    for aws_resource in collector(target.create_session()):
+                        if stopped.is_set():
+                            break
+                        job.record_resource(aws_resource)
+                        publish(aws_resource, target, region_name)
+                        collected += 1
+                    else:
+                        job.finish()
+        except BaseException as e:
+            error = e
+        timings[name] = time.perf_counter() - start
+        metrics.record(f"collector.{collector.__name__}", timings[name])
+        metrics.increment(f"collector.{collector.__name__}.resources", collected)
+        results.put(JobFinished(error))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        jobs: List[Tuple[Collector, CollectionTarget, str, str]] = collection_jobs(collectors, global_collectors, targets)
+        for job in jobs:
+            executor.submit(run_collection_job, *job)
+        remaining: int = len(jobs)
+        try:
+            while remaining:
+                item = results.get()
+                if isinstance(item, JobFinished):
+                    remaining -= 1
+                    if item.error is not None:
+                        raise item.error
+                    continue
+                yield item
+        finally:
+
+            # Unblock any collectors still waiting on a full queue
+            stopped.set()
+            while remaining:
+                if isinstance(results.get(), JobFinished):
+                    remaining -= 1
+
+
+def collect_aws_resources(
+    collectors: List[Collector],
+    global_collectors: List[Collector],
+    targets: List[CollectionTarget],
+    aws_resources: Dict[str, Dict[str, dict]],
+    workers: int,
+    checkpoint: Checkpoint = None
+) -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    for aws_resource in stream_aws_resources(collectors, global_collectors, targets, workers, timings, checkpoint=checkpoint):
+        aws_resources[aws_resource.aws_resource_type][aws_resource.arn] = aws_resource
+    return timings
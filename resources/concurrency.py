@@ -0,0 +1,44 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Generator, Iterable, TypeVar
+
+from resources.checkpoint import JobState, current_job
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+
+class DetailCalls:
+
+    # Per-resource detail calls (describe_table, get_queue_attributes, ...) are one round trip each. With a
+    # concurrency above 1 up to that many are in flight at once on the collector's client, whose connection
+    # pool is sized to match, and results still come back in the order of their items
+    def __init__(self, concurrency: int = 8) -> None:
+        self.concurrency: int = concurrency
+
+    def map(self, function: Callable[[Item], Result], items: Iterable[Item], key: Callable[[Item], object] = None) -> Generator[Result, None, None]:
+
+        # In a checkpointed job, items fetched by an earlier attempt are answered from its state file
+        job: JobState = current_job()
+        if job is not None:
+            function = job.cached(function, key or (lambda item: item))
+        if self.concurrency <= 1:
+            yield from map(function, items)
+            return
+
+        # A sliding window rather than fixed chunks, so one slow call only holds back what's queued behind it
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending: Deque[Future] = deque()
+            try:
+                for item in items:
+                    if len(pending) >= self.concurrency:
+                        yield pending.popleft().result()
+                    pending.append(executor.submit(function, item))
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+detail_calls = DetailCalls()
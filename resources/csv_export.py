@@ -0,0 +1,154 @@
+import csv
+import os
+from collections import OrderedDict
+from typing import Dict, List, Set, Tuple
+
+from resources.relationships import RelationshipBuilder
+
+
+IMPORT_ARGS = "import.args"
+
+
+class CSVExporter:
+
+    # Writes what Neo4jIngestor would send over Bolt as neo4j-admin import files instead. Rows go straight to
+    # disk, only the ARNs of nodes are held on to, to write placeholders for relationship ends nothing collected
+    def __init__(self, directory: str, max_open_files: int = 128) -> None:
+        self.directory: str = os.path.abspath(directory)
+        self.max_open_files: int = max_open_files
+        self.files: "OrderedDict[str, Tuple[object, csv.writer]]" = OrderedDict()
+        self.headers: Dict[str, List[str]] = {}
+        self.node_arns: Dict[str, Set[str]] = {}
+        self.referenced_arns: Dict[str, Set[str]] = {}
+        self.relationship_owner: str = None
+        self.owner_relationships: Set[Tuple[str, str, str, str]] = set()
+        self.node_files: List[str] = []
+        self.relationship_files: List[str] = []
+        self.nodes: int = 0
+        self.relationships: int = 0
+        os.makedirs(os.path.join(directory, "nodes"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "relationships"), exist_ok=True)
+
+    def writer(self, path: str, header: List[str]) -> csv.writer:
+        if path in self.headers and self.headers[path] != header:
+            raise ValueError(f"{path} has the columns {self.headers[path]}, not {header}")
+        if path in self.files:
+            self.files.move_to_end(path)
+            return self.files[path][1]
+
+        # Hundreds of relationship types would exhaust file descriptors, so the least recently used file is closed
+        if len(self.files) >= self.max_open_files:
+            _, (f, _) = self.files.popitem(last=False)
+            f.close()
+        is_new: bool = path not in self.headers
+        f = open(os.path.join(self.directory, path), "w" if is_new else "a", newline="")
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        if is_new:
+            self.headers[path] = header
+            writer.writerow(header)
+        self.files[path] = (f, writer)
+        return writer
+
+    def add_node(self, label: str, properties: dict) -> None:
+        path: str = os.path.join("nodes", f"{label}.csv")
+        if path not in self.headers:
+            self.node_files.append(path)
+        fields: List[str] = [field for field in properties if field != "arn"]
+        writer: csv.writer = self.writer(path, [f"arn:ID({label})"] + [property_header(field, properties[field]) for field in fields] + [":LABEL"])
+        writer.writerow([properties["arn"]] + [csv_value(properties[field]) for field in fields] + [label])
+        self.node_arns.setdefault(label, set()).add(properties["arn"])
+        self.nodes += 1
+
+    def add_relationship(self, source_label: str, source_arn: str, relationship: str, dst_label: str, dst_arn: str, extra: str = None, owner: str = None, properties: dict = None) -> None:
+        path: str = os.path.join("relationships", f"{source_label}-{relationship}-{dst_label}.csv")
+
+        # MERGE matches relationships on their ends, type, extra and owner, so a repeated one isn't written twice.
+        # A resource's relationships are all written while it's built, so only the current owner's are held on to
+        if owner != self.relationship_owner:
+            self.relationship_owner = owner
+            self.owner_relationships.clear()
+        key: Tuple[str, str, str, str] = (path, source_arn, dst_arn, extra if extra is not None else "")
+        if key in self.owner_relationships:
+            return
+        self.owner_relationships.add(key)
+        if path not in self.headers:
+            self.relationship_files.append(path)
+        properties = properties or {}
+        writer: csv.writer = self.writer(
+            path,
+            [f":START_ID({source_label})", f":END_ID({dst_label})", "extra", "owner"]
+            + [property_header(field, properties[field]) for field in sorted(properties)]
+            + [":TYPE"]
+        )
+        writer.writerow(
+            [source_arn, dst_arn, extra if extra is not None else "", owner if owner is not None else ""]
+            + [csv_value(properties[field]) for field in sorted(properties)]
+            + [relationship]
+        )
+        self.referenced_arns.setdefault(source_label, set()).add(source_arn)
+        self.referenced_arns.setdefault(dst_label, set()).add(dst_arn)
+        self.relationships += 1
+
+    def flush(self) -> None:
+        for f, _ in self.files.values():
+            f.flush()
+
+    def close(self) -> None:
+
+        # Relationship ends nothing collected become bare placeholder nodes, as MERGE would have made them
+        for label in sorted(self.referenced_arns):
+            placeholder_arns: List[str] = sorted(self.referenced_arns[label] - self.node_arns.get(label, set()))
+            if not placeholder_arns:
+                continue
+            path: str = os.path.join("nodes", f"{label}.placeholders.csv")
+            self.node_files.append(path)
+            writer: csv.writer = self.writer(path, [f"arn:ID({label})", ":LABEL"])
+            for arn in placeholder_arns:
+                writer.writerow([arn, label])
+                self.nodes += 1
+        for f, _ in self.files.values():
+            f.close()
+        self.files.clear()
+
+        # neo4j-admin reads arguments from a file passed as @import.args
+        with open(os.path.join(self.directory, IMPORT_ARGS), "w") as f:
+            for path in self.node_files:
+                f.write(f"--nodes={os.path.join(self.directory, path)}\n")
+            for path in self.relationship_files:
+                f.write(f"--relationships={os.path.join(self.directory, path)}\n")
+
+
+def property_header(field: str, value) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{field}:string[]"
+    if isinstance(value, bool):
+        return f"{field}:boolean"
+    if isinstance(value, int):
+        return f"{field}:long"
+    return field
+
+
+def csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ";".join(str(item) for item in value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def export_csv(directory: str, aws_resources: Dict[str, Dict[str, dict]], collapse_actions: bool = False) -> CSVExporter:
+
+    # Resources are visited in sorted order so the same inventory always produces byte-identical files
+    ordered_resources: Dict[str, Dict[str, dict]] = {
+        label: {arn: aws_resources[label][arn] for arn in sorted(aws_resources[label])}
+        for label in sorted(aws_resources)
+    }
+    exporter = CSVExporter(directory)
+    for label in ordered_resources:
+        for resource_arn in ordered_resources[label]:
+            ordered_resources[label][resource_arn].create_neo4j_node(exporter)
+    RelationshipBuilder(ordered_resources, collapse_actions, retain_edges=False).build(exporter)
+    exporter.close()
+    return exporter
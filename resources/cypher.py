@@ -0,0 +1,96 @@
+import threading
+from typing import Callable, Dict, Tuple
+
+from resources.metrics import metrics
+
+
+def escape_identifier(name: str) -> str:
+
+    # Labels and relationship types can't be parameters, so they're the only values that end up in the query text
+    return "`" + name.replace("`", "``") + "`"
+
+
+def merge_nodes(label: str) -> str:
+    return (
+        "UNWIND $rows AS row "
+        f"MERGE (n:{escape_identifier(label)} {{arn: row.arn}}) "
+        "SET n = row"
+    )
+
+
+def merge_relationships(source_label: str, relationship: str, dst_label: str) -> str:
+    return (
+        "UNWIND $rows AS row "
+        f"MERGE (src:{escape_identifier(source_label)} {{arn: row.source_arn}}) "
+        f"MERGE (dst:{escape_identifier(dst_label)} {{arn: row.dst_arn}}) "
+        f"MERGE (src)-[r:{escape_identifier(relationship)} {{extra: row.extra, owner: row.owner}}]->(dst) "
+        "SET r += row.properties"
+    )
+
+
+def delete_owned_relationships(label: str) -> str:
+    return (
+        "UNWIND $rows AS row "
+        f"MATCH (n:{escape_identifier(label)} {{arn: row.arn}})-[r]-() "
+        "WHERE r.owner = row.arn "
+        "WITH DISTINCT r "
+        "DELETE r"
+    )
+
+
+def demote_nodes(label: str) -> str:
+    return (
+        "UNWIND $rows AS row "
+        f"MATCH (n:{escape_identifier(label)} {{arn: row.arn}}) "
+        "SET n = {arn: row.arn}"
+    )
+
+
+def delete_unconnected_placeholders(label: str) -> str:
+    return (
+        f"MATCH (n:{escape_identifier(label)}) "
+        "WHERE n.fingerprint IS NULL AND NOT (n)--() "
+        "DELETE n"
+    )
+
+
+def set_reach_counts(label: str) -> str:
+    return (
+        "UNWIND $rows AS row "
+        f"MATCH (n:{escape_identifier(label)} {{arn: row.arn}}) "
+        "SET n.reach_count = row.reach_count"
+    )
+
+
+def delete_relationships_of_type(relationship: str) -> str:
+    return (
+        f"MATCH ()-[r:{escape_identifier(relationship)}]->() "
+        "WITH r LIMIT $limit "
+        "DELETE r"
+    )
+
+
+class QueryTemplates:
+
+    # Every (template, labels, relationship type) combination renders to one fixed query text, with all
+    # values passed as parameters, so Neo4j plans it once and serves every later batch from its plan cache
+    def __init__(self) -> None:
+        self.queries: Dict[Tuple[Callable, Tuple[str, ...]], str] = {}
+        self.lock = threading.Lock()
+
+    def get(self, template: Callable, *identifiers: str) -> str:
+        key: Tuple[Callable, Tuple[str, ...]] = (template, identifiers)
+        with self.lock:
+            query: str = self.queries.get(key)
+            if query is None:
+                query = self.queries[key] = template(*identifiers)
+                metrics.increment("cypher.templates_rendered")
+            else:
+                metrics.increment("cypher.templates_reused")
+            return query
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+
+query_templates = QueryTemplates()
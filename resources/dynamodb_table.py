@@ -1,25 +1,25 @@
-from typing import Generator, List
+from typing import Generator
 
 import boto3
 
 from resources.aws_resource import AWSResource
+from resources.call_scheduler import create_client
+from resources.checkpoint import paginate
+from resources.concurrency import detail_calls
 
 
 class DynamoDBTable(AWSResource):
 
-    def __init__(self, s3_bucket: dict, should_dump_json: bool = False) -> None:
-        self.attr_map = {
-            "name": "TableName",
-            "arn": "TableArn",
-        }
-        super().__init__("DynamoDBTable", s3_bucket, should_dump_json)
+    aws_resource_type = "DynamoDBTable"
+    attr_map = {
+        "name": "TableName",
+        "arn": "TableArn",
+    }
+    __slots__ = tuple(attr_map)
 
 
-def retrieve_dynamodb_tables() -> Generator[DynamoDBTable, None, None]:
-    ddb = boto3.client("dynamodb")
-    paginator = ddb.get_paginator("list_tables")
-    for response in paginator.paginate(PaginationConfig={"PageSize": 50}):
-        table_names: List[str] = response["TableNames"]
-        for table_name in table_names:
-            table = ddb.describe_table(TableName=table_name)
-            yield DynamoDBTable(table["Table"])
+def retrieve_dynamodb_tables(session: boto3.session.Session = None) -> Generator[DynamoDBTable, None, None]:
+    session = session or boto3.session.Session()
+    ddb = create_client(session, "dynamodb")
+    for table in detail_calls.map(lambda table_name: ddb.describe_table(TableName=table_name), paginate(ddb, "list_tables", "TableNames", 50)):
+        yield DynamoDBTable(table["Table"])
@@ -0,0 +1,68 @@
+import fnmatch
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Generator, List, Set, Union
+
+import boto3
+
+from resources.call_scheduler import create_client
+from resources.checkpoint import in_current_job, paginate
+from resources.glue_catalog import GlueCatalog
+from resources.glue_database import GlueDatabase
+from resources.glue_table import GlueTable
+
+
+def is_selected_database(database_name: str, include: List[str], exclude: List[str]) -> bool:
+    if include and not any(fnmatch.fnmatchcase(database_name, pattern) for pattern in include):
+        return False
+    return not any(fnmatch.fnmatchcase(database_name, pattern) for pattern in exclude or [])
+
+
+def retrieve_database_tables(glue, database_name: str) -> List[dict]:
+    return list(paginate(glue, "get_tables", "TableList", 100, DatabaseName=database_name))
+
+
+def retrieve_glue_resources(
+    session: boto3.session.Session = None,
+    include: List[str] = None,
+    exclude: List[str] = None,
+    concurrency: int = 8
+) -> Generator[Union[GlueCatalog, GlueDatabase, GlueTable], None, None]:
+
+    session = session or boto3.session.Session()
+    region: str = session.region_name
+    account_id: str = create_client(session, "sts").get_caller_identity().get("Account")
+    arn_prefix: str = f"arn:aws:glue:{region}:{account_id}"
+    yield GlueCatalog({
+        "GlueCatalogArn": f"{arn_prefix}:catalog"
+    })
+
+    # Clients are thread-safe even though sessions aren't, so the table crawlers share this one, with a
+    # connection for each of them and one for listing databases. At most `concurrency` databases are paged
+    # at once, which also bounds how many tables are held before they're yielded
+    glue = create_client(session, "glue", concurrency + 1)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending: Set[Future] = set()
+        for database in paginate(glue, "get_databases", "DatabaseList", 100):
+            if not is_selected_database(database["Name"], include, exclude):
+                continue
+            database["GlueDatabaseArn"] = f"{arn_prefix}:database/{database['Name']}"
+            database.setdefault("Description", "")
+            yield GlueDatabase(database)
+
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from glue_tables(done, arn_prefix)
+            future: Future = executor.submit(in_current_job(retrieve_database_tables), glue, database["Name"])
+            future.database_name = database["Name"]
+            pending.add(future)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from glue_tables(done, arn_prefix)
+
+
+def glue_tables(futures: Set[Future], arn_prefix: str) -> Generator[GlueTable, None, None]:
+    for future in futures:
+        for table in future.result():
+            table["GlueTableArn"] = f"{arn_prefix}:table/{future.database_name}/{table['Name']}"
+            yield GlueTable(table)
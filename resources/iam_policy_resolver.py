@@ -0,0 +1,102 @@
+import threading
+from typing import Dict, List, Tuple
+
+from resources.metrics import metrics
+from resources.policy_statements import statement_pool
+
+
+class IAMPolicyResolver:
+
+    def __init__(self, iam) -> None:
+        self.iam = iam
+        self.role_policies: Dict[str, Dict[str, Tuple[dict, ...]]] = {}
+        self.managed_policies: Dict[str, dict] = {}
+        self.policy_versions: Dict[Tuple[str, str], List[dict]] = {}
+
+        # Every region's Lambda collector of an account resolves through the same resolver. Resolution is
+        # serialized, so two regions never fetch the same role, and IAM is one global endpoint anyway
+        self.lock = threading.Lock()
+
+    def resolve_role_policies(self, role_name: str) -> Dict[str, Tuple[dict, ...]]:
+        with self.lock:
+            return self.resolve_role_policies_unlocked(role_name)
+
+    def resolve_role_policies_unlocked(self, role_name: str) -> Dict[str, Tuple[dict, ...]]:
+        if role_name in self.role_policies:
+            metrics.increment("iam_policy_resolver.hits")
+            return self.role_policies[role_name]
+        metrics.increment("iam_policy_resolver.misses")
+
+        policies: Dict[str, List[dict]] = {}
+
+        # Inline role policies
+        response = self.iam.list_role_policies(RoleName=role_name)
+        policy_names: List[str] = response["PolicyNames"]
+        for policy_name in policy_names:
+            response = self.iam.get_role_policy(
+                RoleName=role_name,
+                PolicyName=policy_name
+            )
+            policies[policy_name] = response["PolicyDocument"]["Statement"]
+
+        # Managed role policies
+        response = self.iam.list_attached_role_policies(
+            RoleName=role_name,
+        )
+        if "AttachedPolicies" in response:
+            for attached_policy in response["AttachedPolicies"]:
+                policy: dict = self.resolve_managed_policy(attached_policy["PolicyArn"])
+                if isinstance(policy, dict) and "Policy" in policy and "Arn" in policy["Policy"] and "DefaultVersionId" in policy["Policy"]:
+                    statements: List[dict] = self.resolve_policy_version(policy["Policy"]["Arn"], policy["Policy"]["DefaultVersionId"])
+                    if statements is not None:
+                        policies[policy["Policy"]["PolicyName"]] = statements
+
+        self.role_policies[role_name] = statement_pool.intern_policies(policies)
+        return self.role_policies[role_name]
+
+    def resolve_managed_policy(self, policy_arn: str) -> dict:
+        if policy_arn in self.managed_policies:
+            metrics.increment("iam_policy_resolver.hits")
+            return self.managed_policies[policy_arn]
+        metrics.increment("iam_policy_resolver.misses")
+        self.managed_policies[policy_arn] = self.iam.get_policy(PolicyArn=policy_arn)
+        return self.managed_policies[policy_arn]
+
+    def resolve_policy_version(self, policy_arn: str, version_id: str) -> List[dict]:
+        key: Tuple[str, str] = (policy_arn, version_id)
+        if key in self.policy_versions:
+            metrics.increment("iam_policy_resolver.hits")
+            return self.policy_versions[key]
+        metrics.increment("iam_policy_resolver.misses")
+
+        statements: List[dict] = None
+        policy_version = self.iam.get_policy_version(
+            PolicyArn=policy_arn,
+            VersionId=version_id
+        )
+        if isinstance(policy_version, dict) and "PolicyVersion" in policy_version and "Document" in policy_version["PolicyVersion"] and "Statement" in policy_version["PolicyVersion"]["Document"]:
+            statements = policy_version["PolicyVersion"]["Document"]["Statement"]
+        self.policy_versions[key] = statements
+        return statements
+
+
+class IAMPolicyResolvers:
+
+    # IAM is global, so roles and managed policies are fetched once per account however many regions
+    # are collected
+    def __init__(self) -> None:
+        self.resolvers: Dict[str, IAMPolicyResolver] = {}
+        self.lock = threading.Lock()
+
+    def for_account(self, account_id: str, create_iam) -> IAMPolicyResolver:
+
+        # Without a known account there's nothing to share safely
+        if account_id is None:
+            return IAMPolicyResolver(create_iam())
+        with self.lock:
+            if account_id not in self.resolvers:
+                self.resolvers[account_id] = IAMPolicyResolver(create_iam())
+            return self.resolvers[account_id]
+
+
+iam_policy_resolvers = IAMPolicyResolvers()
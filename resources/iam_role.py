@@ -3,21 +3,22 @@ from typing import Generator
 import boto3
 
 from resources.aws_resource import AWSResource
+from resources.call_scheduler import create_client
+from resources.checkpoint import paginate
 
 
 class IAMRole(AWSResource):
 
-    def __init__(self, iam_role: dict, should_dump_json: bool = False) -> None:
-        self.attr_map = {
-            "arn": "Arn",
-            "name": "RoleName"
-        }
-        super().__init__("IAMRole", iam_role, should_dump_json)
+    aws_resource_type = "IAMRole"
+    attr_map = {
+        "arn": "Arn",
+        "name": "RoleName"
+    }
+    __slots__ = tuple(attr_map)
 
 
-def retrieve_iam_roles() -> Generator[IAMRole, None, None]:
-    iam = boto3.client("iam")
-    paginator = iam.get_paginator("list_roles")
-    for response in paginator.paginate(PaginationConfig={"PageSize": 50}):
-        for role in response["Roles"]:
-            yield IAMRole(role)
+def retrieve_iam_roles(session: boto3.session.Session = None) -> Generator[IAMRole, None, None]:
+    session = session or boto3.session.Session()
+    iam = create_client(session, "iam")
+    for role in paginate(iam, "list_roles", "Roles", 50):
+        yield IAMRole(role)
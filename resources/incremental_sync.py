@@ -0,0 +1,117 @@
+import hashlib
+import json
+from typing import Dict, List, Set, Tuple
+
+from resources.aws_resource import PLACEHOLDER_LABELS, AWSResource
+from resources.cypher import delete_owned_relationships, delete_unconnected_placeholders, demote_nodes, query_templates
+from resources.ingestion import Neo4jIngestor, RelationshipRecorder
+from resources.registry import registry
+from resources.relationships import RelationshipBuilder
+
+
+class SyncSummary:
+
+    def __init__(self) -> None:
+        self.added: int = 0
+        self.changed: int = 0
+        self.removed: int = 0
+        self.unchanged: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.added} added, {self.changed} changed, {self.removed} removed, {self.unchanged} unchanged"
+
+
+def relationships_fingerprint(relationships: List[Tuple[str, str, str, str, str, str, dict]]) -> str:
+
+    # Relationships without properties fingerprint the same as before relationships could carry any
+    relationships = [relationship[:6] if relationship[6] is None else relationship for relationship in relationships]
+    document: str = json.dumps(sorted(relationships, key=lambda relationship: [str(field) for field in relationship]), sort_keys=True)
+    return hashlib.sha256(document.encode()).hexdigest()
+
+
+def write_in_batches(ingestor: Neo4jIngestor, query: str, rows: List[dict]) -> None:
+    for i in range(0, len(rows), ingestor.batch_size):
+        ingestor.write(query, rows[i:i + ingestor.batch_size])
+
+
+def sync_incrementally(
+    ingestor: Neo4jIngestor,
+    aws_resources: Dict[str, Dict[str, dict]],
+    relationship_builder: RelationshipBuilder = None,
+    scopes: Set[Tuple[str, str]] = None
+) -> SyncSummary:
+    relationship_builder = relationship_builder or RelationshipBuilder(aws_resources)
+    summary = SyncSummary()
+
+    # The (account_id, region) pairs this run collected, "global" standing for an account's global services.
+    # Without them, the pairs the collected resources came from
+    if scopes is None:
+        scopes = {
+            (aws_resource.account_id, aws_resource.region)
+            for aws_resource_category in aws_resources
+            for aws_resource in aws_resources[aws_resource_category].values()
+        }
+
+    # Fingerprints of the resources Neo4j already holds within those scopes, keyed by (label, arn). Resources of
+    # other accounts and regions in the same graph weren't looked at by this run, so they can't have vanished
+    existing: Dict[Tuple[str, str], Tuple[str, str]] = {
+        (record["label"], record["arn"]): (record["fingerprint"], record["relationships_fingerprint"])
+        for record in ingestor.read(
+            "MATCH (n) WHERE n.fingerprint IS NOT NULL "
+            "RETURN labels(n)[0] AS label, n.arn AS arn, n.account_id AS account_id, n.region AS region, "
+            "n.fingerprint AS fingerprint, n.relationships_fingerprint AS relationships_fingerprint"
+        )
+        if (record["account_id"], record["region"]) in scopes
+    }
+
+    # Relationships are built in memory so wildcard expansions over added or removed resources are detected too
+    recorder = RelationshipRecorder()
+    relationship_builder.build(recorder)
+
+    stale: Dict[str, List[dict]] = {}
+    pending: List[Tuple[AWSResource, str]] = []
+    collected: Set[Tuple[str, str]] = set()
+    for aws_resource_category in aws_resources:
+        for resource_arn in aws_resources[aws_resource_category]:
+            aws_resource: AWSResource = aws_resources[aws_resource_category][resource_arn]
+            key: Tuple[str, str] = (aws_resource.aws_resource_type, resource_arn)
+            collected.add(key)
+            fingerprints: Tuple[str, str] = (aws_resource.fingerprint(), relationships_fingerprint(recorder.relationships.get(resource_arn, [])))
+            if key not in existing:
+                summary.added += 1
+            elif existing[key] != fingerprints:
+                summary.changed += 1
+                stale.setdefault(aws_resource.aws_resource_type, []).append({"arn": resource_arn})
+            else:
+                summary.unchanged += 1
+                continue
+            pending.append((aws_resource, fingerprints[1]))
+
+    # Vanished resources lose their relationships and are demoted to placeholders, since other
+    # resources' policies may still point at them
+    vanished: Dict[str, List[dict]] = {}
+    for label, resource_arn in existing.keys() - collected:
+        summary.removed += 1
+        vanished.setdefault(label, []).append({"arn": resource_arn})
+
+    for label, rows in list(stale.items()) + list(vanished.items()):
+        write_in_batches(ingestor, query_templates.get(delete_owned_relationships, label), rows)
+    for label, rows in vanished.items():
+        write_in_batches(ingestor, query_templates.get(demote_nodes, label), rows)
+
+    for aws_resource, fingerprint in pending:
+        properties: dict = aws_resource.node_properties()
+        properties["relationships_fingerprint"] = fingerprint
+        ingestor.add_node(aws_resource.aws_resource_type, properties)
+    ingestor.flush()
+
+    for aws_resource, fingerprint in pending:
+        for relationship in recorder.relationships.get(aws_resource.arn, []):
+            source_label, source_arn, relationship_type, dst_label, dst_arn, extra, properties = relationship
+            ingestor.add_relationship(source_label, source_arn, relationship_type, dst_label, dst_arn, extra, owner=aws_resource.arn, properties=properties)
+    ingestor.flush()
+
+    # Drop placeholders nothing points at anymore, only among the labels the mapper writes
+    for label in registry.labels() + PLACEHOLDER_LABELS:
+        ingestor.write(query_templates.get(delete_unconnected_placeholders, label), [])
+    return summary
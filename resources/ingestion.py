@@ -0,0 +1,111 @@
+from typing import Dict, List, Set, Tuple
+
+from resources.cypher import merge_nodes, merge_relationships, query_templates
+from resources.metrics import metrics
+
+
+class Neo4jIngestor:
+
+    def __init__(self, session, batch_size: int = 1000) -> None:
+        self.session = session
+        self.batch_size: int = batch_size
+        self.nodes: Dict[str, List[dict]] = {}
+        self.relationships: Dict[Tuple[str, str, str], List[dict]] = {}
+        self.transactions: int = 0
+        self.executed_queries: Set[str] = set()
+
+    def add_node(self, label: str, properties: dict) -> None:
+        rows: List[dict] = self.nodes.setdefault(label, [])
+        rows.append(properties)
+        if len(rows) >= self.batch_size:
+            self.flush_nodes(label)
+
+    def add_relationship(self, source_label: str, source_arn: str, relationship: str, dst_label: str, dst_arn: str, extra: str = None, owner: str = None, properties: dict = None) -> None:
+        key: Tuple[str, str, str] = (source_label, relationship, dst_label)
+        rows: List[dict] = self.relationships.setdefault(key, [])
+        rows.append({
+            "source_arn": source_arn,
+            "dst_arn": dst_arn,
+            "extra": extra if extra is not None else "",
+            "owner": owner if owner is not None else "",
+            "properties": properties if properties is not None else {}
+        })
+        if len(rows) >= self.batch_size:
+            self.flush_relationships(key)
+
+    def flush_nodes(self, label: str) -> None:
+        rows: List[dict] = self.nodes.pop(label, [])
+        if rows:
+            self.write(query_templates.get(merge_nodes, label), rows)
+
+    def flush_relationships(self, key: Tuple[str, str, str]) -> None:
+        source_label, relationship, dst_label = key
+        rows: List[dict] = self.relationships.pop(key, [])
+        if rows:
+            self.write(query_templates.get(merge_relationships, source_label, relationship, dst_label), rows)
+
+    def flush(self) -> None:
+
+        # Nodes go first so relationship MERGEs find them instead of creating placeholders
+        for label in list(self.nodes):
+            self.flush_nodes(label)
+        for key in list(self.relationships):
+            self.flush_relationships(key)
+
+    def write(self, query: str, rows: List[dict], **parameters):
+        with metrics.timer("neo4j.write_transaction"):
+            summary = self.session.write_transaction(Neo4jIngestor.run_batch, query, rows, parameters)
+        metrics.increment("neo4j.rows_written", len(rows))
+        self.transactions += 1
+
+        # result_available_after includes planning, which only the first run of a query text pays for
+        # while the plan stays in Neo4j's query cache
+        run: str = "reused_query" if query in self.executed_queries else "new_query"
+        self.executed_queries.add(query)
+        if summary is not None and summary.result_available_after is not None:
+            metrics.record(f"neo4j.result_available_after.{run}", summary.result_available_after / 1000)
+        return summary
+
+    def read(self, query: str, **parameters) -> List[dict]:
+        with metrics.timer("neo4j.read_transaction"):
+            return self.session.read_transaction(Neo4jIngestor.fetch, query, parameters)
+
+    def run_batch(tx, query: str, rows: List[dict], parameters: dict):
+        return tx.run(query, rows=rows, **parameters).consume()
+
+    def fetch(tx, query: str, parameters: dict) -> List[dict]:
+        return [record.data() for record in tx.run(query, **parameters)]
+
+
+class RelationshipRecorder:
+
+    def __init__(self) -> None:
+        self.relationships: Dict[str, List[Tuple[str, str, str, str, str, str, dict]]] = {}
+
+    def add_node(self, label: str, properties: dict) -> None:
+        pass
+
+    def add_relationship(self, source_label: str, source_arn: str, relationship: str, dst_label: str, dst_arn: str, extra: str = None, owner: str = None, properties: dict = None) -> None:
+        self.relationships.setdefault(owner, []).append((source_label, source_arn, relationship, dst_label, dst_arn, extra, properties))
+
+    def flush(self) -> None:
+        pass
+
+
+class TeeIngestor:
+
+    # Hands every node and relationship to several sinks, so one build pass feeds Neo4j and any index next to it
+    def __init__(self, *sinks) -> None:
+        self.sinks: tuple = sinks
+
+    def add_node(self, label: str, properties: dict) -> None:
+        for sink in self.sinks:
+            sink.add_node(label, properties)
+
+    def add_relationship(self, source_label: str, source_arn: str, relationship: str, dst_label: str, dst_arn: str, extra: str = None, owner: str = None, properties: dict = None) -> None:
+        for sink in self.sinks:
+            sink.add_relationship(source_label, source_arn, relationship, dst_label, dst_arn, extra, owner, properties)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
@@ -3,18 +3,19 @@ from typing import Generator
 import boto3
 
 from resources.aws_resource import AWSResource
+from resources.call_scheduler import create_client
+from resources.checkpoint import paginate
 
 
 class KMSKey(AWSResource):
 
-    def __init__(self, kms_key: dict, should_dump_json: bool = False) -> None:
-        self.attr_map = {"arn": "KeyArn"}
-        super().__init__("KMSKey", kms_key, should_dump_json)
+    aws_resource_type = "KMSKey"
+    attr_map = {"arn": "KeyArn"}
+    __slots__ = tuple(attr_map)
 
 
-def retrieve_kms_keys() -> Generator[KMSKey, None, None]:
-    kms = boto3.client("kms")
-    paginator = kms.get_paginator("list_keys")
-    for response in paginator.paginate(PaginationConfig={"PageSize": 50}):
-        for key in response["Keys"]:
-            yield KMSKey(key)
+def retrieve_kms_keys(session: boto3.session.Session = None) -> Generator[KMSKey, None, None]:
+    session = session or boto3.session.Session()
+    kms = create_client(session, "kms")
+    for key in paginate(kms, "list_keys", "Keys", 50):
+        yield KMSKey(key)
@@ -0,0 +1,137 @@
+import cProfile
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+
+class Timer:
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def to_dict(self) -> dict:
+        return dict(count=self.count, total_seconds=self.total, max_seconds=self.max)
+
+
+class Metrics:
+
+    def __init__(self) -> None:
+        self.timers: Dict[str, Timer] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, name: str, seconds: float) -> None:
+        with self.lock:
+            timer: Timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = Timer()
+            timer.count += 1
+            timer.total += seconds
+            timer.max = max(timer.max, seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable:
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start: float = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return dict(
+                timers={name: self.timers[name].to_dict() for name in sorted(self.timers)},
+                counters={name: self.counters[name] for name in sorted(self.counters)}
+            )
+
+    def write_report(self, path: str, **extra) -> None:
+        report: dict = dict(extra, **self.to_dict())
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4, default=str)
+
+    def write_prometheus(self, path: str, prefix: str = "aws_resource_mapper") -> None:
+        lines: List[str] = []
+        metrics: dict = self.to_dict()
+        families = [
+            ("timer_seconds_total", "counter", "Total seconds spent in an instrumented operation", "total_seconds"),
+            ("timer_calls_total", "counter", "Number of times an instrumented operation ran", "count"),
+            ("timer_max_seconds", "gauge", "Longest single run of an instrumented operation", "max_seconds"),
+        ]
+        for family, metric_type, description, field in families:
+            lines.append(f"# HELP {prefix}_{family} {description}")
+            lines.append(f"# TYPE {prefix}_{family} {metric_type}")
+            for name, timer in metrics["timers"].items():
+                lines.append(f'{prefix}_{family}{{name="{prometheus_label(name)}"}} {timer[field]}')
+        lines.append(f"# HELP {prefix}_events_total Number of times an instrumented event happened")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in metrics["counters"].items():
+            lines.append(f'{prefix}_events_total{{name="{prometheus_label(name)}"}} {value}')
+
+        # The textfile collector may read at any moment, so the file is swapped in whole
+        temporary_path: str = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, path)
+
+
+def prometheus_label(value: str) -> str:
+    return re.sub(r'(["\\])', r"\\\1", value).replace("\n", "\\n")
+
+
+class Profiler:
+
+    kinds: List[str] = ["cprofile", "pyinstrument"]
+
+    def __init__(self, kind: str) -> None:
+        self.kind: str = kind
+        if kind == "cprofile":
+            self.profiler = cProfile.Profile()
+        else:
+            try:
+                from pyinstrument import Profiler as PyinstrumentProfiler
+            except ImportError:
+                raise ImportError("pyinstrument is not installed, install it with: pip install pyinstrument")
+            self.profiler = PyinstrumentProfiler()
+
+    def start(self) -> None:
+
+        # cProfile only sees the thread it's enabled on, so collector threads show up as time spent waiting
+        if self.kind == "cprofile":
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self, path: str) -> None:
+        if self.kind == "cprofile":
+            self.profiler.disable()
+            self.profiler.dump_stats(path)
+        else:
+            self.profiler.stop()
+            with open(path, "w") as f:
+                f.write(self.profiler.output_html())
+
+
+metrics = Metrics()
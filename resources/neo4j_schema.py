@@ -0,0 +1,91 @@
+from typing import Dict, List
+
+from neo4j.exceptions import Neo4jError
+
+from resources.aws_resource import PLACEHOLDER_LABELS
+from resources.cypher import escape_identifier
+from resources.registry import registry
+
+SYNTAX_ERROR: str = "Neo.ClientError.Statement.SyntaxError"
+ALREADY_EXISTS_ERRORS = {
+    "Neo.ClientError.Schema.EquivalentSchemaRuleAlreadyExists",
+    "Neo.ClientError.Schema.ConstraintAlreadyExists",
+    "Neo.ClientError.Schema.IndexAlreadyExists",
+}
+
+
+def schema_labels() -> List[str]:
+    return sorted(registry.labels()) + PLACEHOLDER_LABELS
+
+
+def schema_rule_name(label: str) -> str:
+    return f"aws_resource_mapper_{label.lower()}_arn"
+
+
+def constraint_statements(label: str) -> List[str]:
+    name: str = escape_identifier(schema_rule_name(label))
+    label = escape_identifier(label)
+    return [
+        f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.arn IS UNIQUE",
+        f"CREATE CONSTRAINT {name} IF NOT EXISTS ON (n:{label}) ASSERT n.arn IS UNIQUE",
+        f"CREATE CONSTRAINT ON (n:{label}) ASSERT n.arn IS UNIQUE",
+    ]
+
+
+def index_statements(label: str) -> List[str]:
+    name: str = escape_identifier(schema_rule_name(label))
+    label = escape_identifier(label)
+    return [
+        f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.arn)",
+        f"CREATE INDEX ON :{label}(arn)",
+    ]
+
+
+def run_first_supported(session, statements: List[str]) -> None:
+
+    # Schema syntax changed between Neo4j 3.5, 4.x and 5.x, so statements are tried newest first
+    for statement in statements:
+        try:
+            session.run(statement).consume()
+            return
+        except Neo4jError as e:
+            if e.code in ALREADY_EXISTS_ERRORS:
+                return
+            if e.code != SYNTAX_ERROR:
+                raise
+    raise ValueError(f"Neo4j supports none of: {statements}")
+
+
+def ensure_schema(session, labels: List[str] = None) -> Dict[str, str]:
+    schema: Dict[str, str] = {}
+    for label in labels or schema_labels():
+
+        # Graphs written before nodes were merged can hold duplicate ARNs, which rule out a uniqueness
+        # constraint. A plain index still turns every MERGE lookup into an index seek
+        try:
+            run_first_supported(session, constraint_statements(label))
+            schema[label] = "constraint"
+        except Neo4jError:
+            run_first_supported(session, index_statements(label))
+            schema[label] = "index"
+
+    # New indexes are populated in the background, MERGEs only use them once they're online
+    try:
+        session.run("CALL db.awaitIndexes(300)").consume()
+    except Neo4jError:
+        pass
+    return schema
+
+
+def verify_schema(session, labels: List[str] = None) -> List[str]:
+    try:
+        records: List = list(session.run("SHOW INDEXES YIELD labelsOrTypes, properties, state"))
+    except Neo4jError:
+        records = list(session.run("CALL db.indexes()"))
+
+    indexed_labels = set()
+    for record in records:
+        index: dict = record.data()
+        if index.get("properties") == ["arn"] and index.get("state") == "ONLINE":
+            indexed_labels.update(index.get("labelsOrTypes") or index.get("tokenNames") or [])
+    return [label for label in labels or schema_labels() if label not in indexed_labels]
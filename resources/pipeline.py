@@ -0,0 +1,32 @@
+from typing import Dict, Iterable, List
+
+from resources.aws_resource import AWSResource
+from resources.relationships import RelationshipBuilder
+
+
+def ingest_while_collecting(
+    ingestor,
+    aws_resource_stream: Iterable[AWSResource],
+    aws_resources: Dict[str, Dict[str, dict]],
+    relationship_builder: RelationshipBuilder = None
+) -> int:
+    relationship_builder = relationship_builder or RelationshipBuilder(aws_resources)
+    deferred: List[AWSResource] = []
+    for aws_resource in aws_resource_stream:
+        aws_resource.create_neo4j_node(ingestor)
+
+        # Relationships that expand wildcards wait for the full inventory, everything else is written
+        # right away and only the resource's ARN is kept around
+        if aws_resource.needs_inventory():
+            aws_resources[aws_resource.aws_resource_type][aws_resource.arn] = aws_resource
+            deferred.append(aws_resource)
+        else:
+            aws_resources[aws_resource.aws_resource_type][aws_resource.arn] = None
+            relationship_builder.create_relationships(ingestor, aws_resource)
+    ingestor.flush()
+
+    relationship_builder.prepare(deferred)
+    for aws_resource in deferred:
+        relationship_builder.create_relationships(ingestor, aws_resource)
+    ingestor.flush()
+    return len(deferred)
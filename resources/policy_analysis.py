@@ -0,0 +1,147 @@
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, FrozenSet, List, Tuple
+
+from resources.metrics import metrics
+
+
+ACTION_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "iam_actions.json")
+
+
+def as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+class ActionCatalog:
+
+    # Actions of the services a Lambda function's policies usually reach, as "service": ["Action", ...]. Actions of
+    # services that aren't in the catalog can't be enumerated, so their patterns are kept as written
+    def __init__(self, path: str = ACTION_CATALOG_PATH) -> None:
+        self.path: str = path
+        self.services: Dict[str, Tuple[str, ...]] = None
+        self.expansions: Dict[str, FrozenSet[str]] = {}
+        self.lock = threading.Lock()
+
+    def load(self) -> Dict[str, Tuple[str, ...]]:
+        if self.services is None:
+            with open(self.path) as f:
+                self.services = {service: tuple(f"{service}:{action}" for action in actions) for service, actions in json.load(f).items()}
+        return self.services
+
+    def expand(self, pattern: str) -> FrozenSet[str]:
+
+        # IAM matches actions case-insensitively, with * and ? wildcards. A bare "*" also covers every service
+        # outside the catalog, which the "*" it keeps stands for
+        with self.lock:
+            if pattern not in self.expansions:
+                services: Dict[str, Tuple[str, ...]] = self.load()
+                lowered: str = pattern.lower()
+                if lowered == "*":
+                    actions: FrozenSet[str] = frozenset(["*"] + [action for service in services for action in services[service]])
+                else:
+                    service_actions: Tuple[str, ...] = services.get(lowered.split(":", 1)[0], ())
+                    actions = frozenset(action for action in service_actions if fnmatch.fnmatchcase(action.lower(), lowered)) or frozenset([pattern])
+                self.expansions[pattern] = actions
+            return self.expansions[pattern]
+
+    def compress(self, actions: FrozenSet[str]) -> List[str]:
+
+        # Every action of a service is written as "service:*", so wildcard grants stay one short list per edge
+        services: Dict[str, Tuple[str, ...]] = self.load()
+        if actions >= self.expand("*"):
+            return ["*"]
+        by_service: Dict[str, List[str]] = {}
+        for action in actions - {"*"}:
+            by_service.setdefault(action.split(":", 1)[0], []).append(action)
+        compressed: List[str] = []
+        for service, service_actions in by_service.items():
+            if service in services and len(service_actions) == len(services[service]):
+                compressed.append(f"{service}:*")
+            else:
+                compressed.extend(service_actions)
+        return sorted(compressed)
+
+
+class StatementAnalysis:
+
+    __slots__ = ("digest", "allow", "action_patterns", "actions", "resource_patterns", "not_resource", "conditional", "service_actions")
+
+    def __init__(self, statement: dict, digest: str, catalog: ActionCatalog) -> None:
+        self.digest: str = digest
+        self.allow: bool = statement.get("Effect", "Allow") == "Allow"
+        self.conditional: bool = bool(statement.get("Condition"))
+
+        # NotAction is evaluated over the catalog, it grants every action of its services except the ones it lists
+        if "NotAction" in statement:
+            excluded: FrozenSet[str] = frozenset().union(*(catalog.expand(pattern) for pattern in as_list(statement["NotAction"])))
+            self.action_patterns: Tuple[str, ...] = None
+            self.actions: FrozenSet[str] = catalog.expand("*") - excluded - {"*"}
+        else:
+            self.action_patterns = tuple(dict.fromkeys(as_list(statement.get("Action", []))))
+            self.actions = frozenset().union(*(catalog.expand(pattern) for pattern in self.action_patterns))
+        self.not_resource: bool = "NotResource" in statement
+        self.resource_patterns: Tuple[str, ...] = tuple(dict.fromkeys(as_list(statement["NotResource"] if self.not_resource else statement.get("Resource", []))))
+        self.service_actions: Dict[str, FrozenSet[str]] = {}
+
+    def services(self) -> FrozenSet[str]:
+        return frozenset(action.split(":", 1)[0] for action in self.actions)
+
+    def actions_on(self, service_name: str) -> FrozenSet[str]:
+
+        # A NotAction statement grants every other catalogued service's actions too, but only the target's
+        # own service's actions apply to it. Targets no service owns (a bare "*") keep the full set
+        if self.action_patterns is not None or service_name is None:
+            return self.actions
+        if service_name not in self.service_actions:
+            self.service_actions[service_name] = frozenset(action for action in self.actions if action.split(":", 1)[0] == service_name)
+        return self.service_actions[service_name]
+
+
+def canonical_statement(statement: dict) -> str:
+
+    # Sids, key order and the order of actions and resources don't change what a statement grants
+    canonical: dict = {"Effect": statement.get("Effect", "Allow")}
+    for field in ("Action", "NotAction", "Resource", "NotResource"):
+        if field in statement:
+            canonical[field] = sorted(set(as_list(statement[field])))
+    if statement.get("Condition"):
+        canonical["Condition"] = statement["Condition"]
+    return json.dumps(canonical, sort_keys=True, default=str)
+
+
+class PolicyAnalyzer:
+
+    # Statements are pooled, so most lookups hit the id cache. Statements that aren't, or that differ only in
+    # ways canonical_statement ignores, still share one analysis through its content hash
+    def __init__(self, catalog: ActionCatalog = None) -> None:
+        self.catalog: ActionCatalog = catalog or ActionCatalog()
+        self.by_id: Dict[int, Tuple[dict, StatementAnalysis]] = {}
+        self.by_digest: Dict[str, StatementAnalysis] = {}
+        self.lock = threading.Lock()
+
+    def analyze(self, statement: dict) -> StatementAnalysis:
+        cached: Tuple[dict, StatementAnalysis] = self.by_id.get(id(statement))
+        if cached is not None and cached[0] is statement:
+            metrics.increment("policy_analysis.cache_hits")
+            return cached[1]
+
+        digest: str = hashlib.sha256(canonical_statement(statement).encode()).hexdigest()
+        with self.lock:
+            analysis: StatementAnalysis = self.by_digest.get(digest)
+        if analysis is None:
+            analysis = StatementAnalysis(statement, digest, self.catalog)
+            metrics.increment("policy_analysis.statements_analyzed")
+        else:
+            metrics.increment("policy_analysis.cache_hits")
+        with self.lock:
+            analysis = self.by_digest.setdefault(digest, analysis)
+
+            # The statement is kept alongside its analysis so its id can't be reused
+            self.by_id[id(statement)] = (statement, analysis)
+        return analysis
+
+
+policy_analyzer = PolicyAnalyzer()
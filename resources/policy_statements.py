@@ -0,0 +1,64 @@
+import json
+import sys
+import threading
+from typing import Dict, List, Set, Tuple
+
+
+def intern_strings(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [intern_strings(item) for item in value]
+    if isinstance(value, dict):
+        return {sys.intern(key): intern_strings(item) for key, item in value.items()}
+    return value
+
+
+class StatementPool:
+
+    def __init__(self) -> None:
+        self.statements: Dict[str, dict] = {}
+        self.policies: Dict[Tuple[Tuple[str, Tuple[int, ...]], ...], Dict[str, Tuple[dict, ...]]] = {}
+        self.pooled_policies: Set[int] = set()
+        self.lock = threading.Lock()
+
+    def intern_statement(self, statement: dict) -> dict:
+
+        # Statements are shared by content, so callers must treat them as read-only
+        key: str = json.dumps(statement, sort_keys=True, default=str)
+        with self.lock:
+            if key not in self.statements:
+                self.statements[key] = intern_strings(statement)
+            return self.statements[key]
+
+    def intern_statements(self, statements: List[dict]) -> Tuple[dict, ...]:
+        if isinstance(statements, dict):
+            statements = [statements]
+        return tuple(self.intern_statement(statement) for statement in statements)
+
+    def intern_policies(self, policies: Dict[str, List[dict]]) -> Dict[str, Tuple[dict, ...]]:
+
+        # Pooled mappings live as long as the pool, so their ids can't be reused by other mappings
+        if id(policies) in self.pooled_policies:
+            return policies
+
+        interned: Dict[str, Tuple[dict, ...]] = {
+            sys.intern(policy_name): self.intern_statements(policies[policy_name])
+            for policy_name in policies
+        }
+
+        # Functions sharing a role end up sharing one policy mapping too
+        key: Tuple[Tuple[str, Tuple[int, ...]], ...] = tuple(
+            (policy_name, tuple(id(statement) for statement in interned[policy_name]))
+            for policy_name in interned
+        )
+        with self.lock:
+            interned = self.policies.setdefault(key, interned)
+            self.pooled_policies.add(id(interned))
+            return interned
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+
+statement_pool = StatementPool()
@@ -0,0 +1,236 @@
+import gzip
+import json
+from array import array
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+
+from resources.cypher import delete_relationships_of_type, query_templates, set_reach_counts
+from resources.metrics import metrics
+from resources.relationships import RelationshipBuilder
+
+
+REACHES = "CAN_REACH"
+
+
+class ReachabilityIndex:
+
+    # A relationship sink: wired next to the real ingestor, it keeps only integer adjacency per node
+    def __init__(self) -> None:
+        self.node_ids: Dict[Tuple[str, str], int] = {}
+        self.nodes: List[Tuple[str, str]] = []
+        self.successors: List[array] = []
+
+    def node_id(self, label: str, arn: str) -> int:
+        key: Tuple[str, str] = (label, arn)
+        node_id: int = self.node_ids.get(key)
+        if node_id is None:
+            node_id = self.node_ids[key] = len(self.nodes)
+            self.nodes.append(key)
+            self.successors.append(array("l"))
+        return node_id
+
+    def add_node(self, label: str, properties: dict) -> None:
+
+        # Resources without relationships get an id too, so they end up with a reach count of 0
+        self.node_id(label, properties["arn"])
+
+    def add_relationship(self, source_label: str, source_arn: str, relationship: str, dst_label: str, dst_arn: str, extra: str = None, owner: str = None, properties: dict = None) -> None:
+        self.successors[self.node_id(source_label, source_arn)].append(self.node_id(dst_label, dst_arn))
+
+    def flush(self) -> None:
+        pass
+
+    @metrics.timed("stage.reachability")
+    def compute(self) -> "Reachability":
+        node_count: int = len(self.nodes)
+        successors: List[List[int]] = [sorted(set(node_successors)) for node_successors in self.successors]
+        self.successors = []
+
+        # Iterative Tarjan: strongly connected components come out sinks first, i.e. in reverse topological order
+        index: List[int] = [-1] * node_count
+        low: List[int] = [0] * node_count
+        on_stack: List[bool] = [False] * node_count
+        component: List[int] = [-1] * node_count
+        stack: List[int] = []
+        counter: int = 0
+        component_count: int = 0
+        for root in range(node_count):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work: List[List[int]] = [[root, 0]]
+            while work:
+                frame: List[int] = work[-1]
+                v, i = frame
+                if i < len(successors[v]):
+                    frame[1] += 1
+                    w: int = successors[v][i]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append([w, 0])
+                    elif on_stack[w]:
+                        low[v] = min(low[v], index[w])
+                    continue
+                work.pop()
+                if work:
+                    u: int = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component[w] = component_count
+                        if w == v:
+                            break
+                    component_count += 1
+
+        # Nodes are ranked component by component, so a component's bitset only spans the ranks of the
+        # components it can reach, all of which were numbered before it
+        members: List[List[int]] = [[] for _ in range(component_count)]
+        for node_id in range(node_count):
+            members[component[node_id]].append(node_id)
+        first_rank: List[int] = [0] * component_count
+        next_rank: int = 0
+        for c in range(component_count):
+            first_rank[c] = next_rank
+            next_rank += len(members[c])
+
+        component_successors: List[List[int]] = [[] for _ in range(component_count)]
+        for v in range(node_count):
+            for w in successors[v]:
+                if component[v] != component[w]:
+                    component_successors[component[v]].append(component[w])
+        component_successors = [sorted(set(targets)) for targets in component_successors]
+
+        reach: List[int] = [0] * component_count
+        for c in range(component_count):
+            bits: int = 0
+            for d in component_successors[c]:
+                bits |= reach[d] | (((1 << len(members[d])) - 1) << first_rank[d])
+            reach[c] = bits
+        return Reachability(self.nodes, component, members, component_successors, reach)
+
+
+class Reachability:
+
+    def __init__(
+        self,
+        nodes: List[Tuple[str, str]],
+        component: List[int],
+        members: List[List[int]],
+        component_successors: List[List[int]],
+        reach: List[int]
+    ) -> None:
+        self.nodes: List[Tuple[str, str]] = nodes
+        self.component: List[int] = component
+        self.members: List[List[int]] = members
+        self.component_successors: List[List[int]] = component_successors
+        self.reach: List[int] = reach
+
+        # Bit i of a reach set stands for the i-th node when nodes are listed component by component
+        self.nodes_by_rank: List[int] = [node_id for component_members in members for node_id in component_members]
+
+    def reach_count(self, node_id: int) -> int:
+
+        # Members of a cycle reach each other, a node on its own doesn't count itself
+        c: int = self.component[node_id]
+        return bin(self.reach[c]).count("1") + len(self.members[c]) - 1
+
+    def reachable(self, node_id: int) -> Iterator[int]:
+        c: int = self.component[node_id]
+        for member in self.members[c]:
+            if member != node_id:
+                yield member
+        bits: str = bin(self.reach[c])[:1:-1]
+        position: int = bits.find("1")
+        while position != -1:
+            yield self.nodes_by_rank[position]
+            position = bits.find("1", position + 1)
+
+    def write_reach_counts(self, ingestor) -> None:
+        rows: Dict[str, List[dict]] = {}
+        for node_id, (label, arn) in enumerate(self.nodes):
+            rows.setdefault(label, []).append({"arn": arn, "reach_count": self.reach_count(node_id)})
+        for label in rows:
+            for i in range(0, len(rows[label]), ingestor.batch_size):
+                ingestor.write(query_templates.get(set_reach_counts, label), rows[label][i:i + ingestor.batch_size])
+
+    def write_can_reach(self, ingestor) -> int:
+
+        # Summary edges from previous runs go first, they may point at resources that are gone
+        while True:
+            summary = ingestor.write(query_templates.get(delete_relationships_of_type, REACHES), [], limit=ingestor.batch_size)
+            if summary is None or summary.counters.relationships_deleted < ingestor.batch_size:
+                break
+
+        count: int = 0
+        for node_id, (label, arn) in enumerate(self.nodes):
+            for reachable_id in self.reachable(node_id):
+                dst_label, dst_arn = self.nodes[reachable_id]
+                ingestor.add_relationship(label, arn, REACHES, dst_label, dst_arn)
+                count += 1
+        ingestor.flush()
+        return count
+
+    def save(self, path: str) -> None:
+
+        # Only the component graph is stored, queries walk it instead of materializing every reach set
+        with gzip.open(path, "wt") as f:
+            json.dump({
+                "nodes": self.nodes,
+                "component": self.component,
+                "component_successors": self.component_successors,
+            }, f, separators=(",", ":"))
+
+
+class ReachabilityQuery:
+
+    def __init__(self, path: str) -> None:
+        with gzip.open(path, "rt") as f:
+            index: dict = json.load(f)
+        self.nodes: List[Tuple[str, str]] = [tuple(node) for node in index["nodes"]]
+        self.component: List[int] = index["component"]
+        self.component_successors: List[List[int]] = index["component_successors"]
+        self.members: List[List[int]] = [[] for _ in self.component_successors]
+        self.node_ids: Dict[str, List[int]] = {}
+        for node_id, (label, arn) in enumerate(self.nodes):
+            self.members[self.component[node_id]].append(node_id)
+            self.node_ids.setdefault(arn, []).append(node_id)
+
+    def reachable(self, arn: str) -> List[Tuple[str, str]]:
+        if arn not in self.node_ids:
+            raise ValueError(f"{arn} isn't in the reachability index")
+
+        # Breadth-first over the component graph, starting from every node carrying the ARN
+        start: List[int] = self.node_ids[arn]
+        seen: set = set()
+        queue: deque = deque()
+        for node_id in start:
+            c: int = self.component[node_id]
+            if len(self.members[c]) > 1:
+                seen.add(c)
+            queue.extend(self.component_successors[c])
+        while queue:
+            c = queue.popleft()
+            if c in seen:
+                continue
+            seen.add(c)
+            queue.extend(self.component_successors[c])
+        return sorted(self.nodes[node_id] for c in seen for node_id in self.members[c] if node_id not in start)
+
+
+def build_reachability_index(aws_resources: Dict[str, Dict[str, dict]], collapse_actions: bool = False) -> ReachabilityIndex:
+
+    # For runs whose relationships aren't built anyway, e.g. incremental syncs that skip unchanged resources
+    reachability_index = ReachabilityIndex()
+    for label in aws_resources:
+        for resource_arn in aws_resources[label]:
+            reachability_index.add_node(label, {"arn": resource_arn})
+    RelationshipBuilder(aws_resources, collapse_actions).build(reachability_index)
+    return reachability_index
@@ -0,0 +1,118 @@
+import functools
+import importlib
+from typing import Callable, Dict, List
+
+PLUGIN_ENTRY_POINT_GROUP = "aws_resource_mapper.services"
+
+
+def load_object(path: str):
+
+    # "package.module:attribute", the same notation entry points use, where attribute can be dotted
+    module_name, attribute = path.split(":")
+    return functools.reduce(getattr, attribute.split("."), importlib.import_module(module_name))
+
+
+class Service:
+
+    # Labels without a relationship builder get their relationships from their resource class'
+    # create_neo4j_relationships. A builder is called as builder(relationship_builder, ingestor, aws_resource)
+    def __init__(self, name: str, collector: str, resource_classes: Dict[str, str], is_global: bool = False, relationship_builders: Dict[str, str] = None) -> None:
+        self.name: str = name
+        self.collector: str = collector
+        self.resource_classes: Dict[str, str] = resource_classes
+        self.is_global: bool = is_global
+        self.relationship_builders: Dict[str, str] = relationship_builders or {}
+
+    def load_collector(self) -> Callable:
+        return load_object(self.collector)
+
+    def load_resource_class(self, label: str):
+        return load_object(self.resource_classes[label])
+
+    def load_relationship_builder(self, label: str) -> Callable:
+        return load_object(self.relationship_builders[label]) if label in self.relationship_builders else None
+
+    def labels(self) -> List[str]:
+        return list(self.resource_classes)
+
+
+class ServiceRegistry:
+
+    # Services only name their collector and resource classes, so nothing (boto3 included) is imported
+    # until a run actually needs a service's collector or classes
+    def __init__(self) -> None:
+        self.services: Dict[str, Service] = {}
+        self.plugins_discovered: bool = False
+
+    def register(self, service: Service) -> Service:
+        for label in service.resource_classes:
+            owner: Service = self.service_of(label)
+            if owner is not None and owner.name != service.name:
+                raise ValueError(f"Label {label} of service {service.name} is already registered by service {owner.name}")
+        self.services[service.name] = service
+        return service
+
+    def discover_plugins(self) -> List[Service]:
+        if self.plugins_discovered:
+            return []
+        self.plugins_discovered = True
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            return []
+        discovered = entry_points()
+        if hasattr(discovered, "select"):
+            discovered = discovered.select(group=PLUGIN_ENTRY_POINT_GROUP)
+        else:
+            discovered = discovered.get(PLUGIN_ENTRY_POINT_GROUP, [])
+        return [self.register(entry_point.load()) for entry_point in discovered]
+
+    def select(self, names: List[str] = None) -> List[Service]:
+        unknown: List[str] = [name for name in names or [] if name not in self.services]
+        if unknown:
+            raise ValueError(f"Unknown services: {', '.join(unknown)} (available: {', '.join(sorted(self.services))})")
+        return [self.services[name] for name in names] if names else list(self.services.values())
+
+    def service_of(self, label: str) -> Service:
+        for service in self.services.values():
+            if label in service.resource_classes:
+                return service
+        return None
+
+    def labels(self) -> List[str]:
+        return [label for service in self.services.values() for label in service.resource_classes]
+
+    def resource_class(self, label: str):
+        service: Service = self.service_of(label)
+        if service is None:
+            raise KeyError(f"No service registers resources labelled {label}")
+        return service.load_resource_class(label)
+
+    def relationship_builder(self, label: str) -> Callable:
+        service: Service = self.service_of(label)
+        return service.load_relationship_builder(label) if service is not None else None
+
+    def empty_inventory(self) -> Dict[str, Dict[str, dict]]:
+
+        # Every label gets an inventory even if its service isn't collected, wildcard expansion looks them all up
+        return {label: {} for label in sorted(self.labels())}
+
+
+registry = ServiceRegistry()
+registry.register(Service("dynamodb", "resources.dynamodb_table:retrieve_dynamodb_tables", {"DynamoDBTable": "resources.dynamodb_table:DynamoDBTable"}))
+registry.register(Service("glue", "resources.glue:retrieve_glue_resources", {
+    "GlueCatalog": "resources.glue_catalog:GlueCatalog",
+    "GlueDatabase": "resources.glue_database:GlueDatabase",
+    "GlueTable": "resources.glue_table:GlueTable",
+}))
+registry.register(Service("iam", "resources.iam_role:retrieve_iam_roles", {"IAMRole": "resources.iam_role:IAMRole"}, is_global=True))
+registry.register(Service("kms", "resources.kms_key:retrieve_kms_keys", {"KMSKey": "resources.kms_key:KMSKey"}))
+registry.register(Service(
+    "lambda",
+    "resources.lmbda:retrieve_lambda_functions",
+    {"Lambda": "resources.lmbda:LambdaFunction"},
+    relationship_builders={"Lambda": "resources.relationships:RelationshipBuilder.create_lambda_relationships"}
+))
+registry.register(Service("s3", "resources.s3_bucket:retrieve_s3_buckets", {"S3Bucket": "resources.s3_bucket:S3Bucket"}, is_global=True))
+registry.register(Service("sns", "resources.sns_topic:retrieve_sns_topics", {"SNSTopic": "resources.sns_topic:SNSTopic"}))
+registry.register(Service("sqs", "resources.sqs_queue:retrieve_sqs_queues", {"SQSQueue": "resources.sqs_queue:SQSQueue"}))
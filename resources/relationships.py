@@ -0,0 +1,223 @@
+from typing import Callable, Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from resources.aws_resource import AWSResource
+from resources.metrics import metrics
+from resources.policy_analysis import StatementAnalysis, policy_analyzer
+from resources.registry import Service, registry
+
+
+# (relationship type, destination label, destination ARN, extra, properties)
+Edge = Tuple[str, str, str, str, dict]
+
+# (destination label, destination ARN, extra)
+Target = Tuple[str, str, str]
+
+COLLAPSED_RELATIONSHIP: str = "CAN_ACCESS"
+
+
+class RelationshipBuilder:
+
+    def __init__(self, aws_resources: Dict[str, Dict[str, dict]], collapse_actions: bool = False, retain_edges: bool = True) -> None:
+        self.aws_resources: Dict[str, Dict[str, dict]] = aws_resources
+        self.collapse_actions: bool = collapse_actions
+        self.retain_edges: bool = retain_edges
+        self.patterns: Dict[str, Tuple[List[str], str, str]] = {}
+        self.statement_targets: Dict[str, List[Target]] = {}
+        self.relationship_types: Dict[str, str] = {}
+        self.builders: Dict[str, Callable] = {}
+        self.service_names: Dict[str, str] = {}
+
+        # Policy mappings are pooled, so every function behind the same execution role shares one mapping and
+        # one edge list. The mappings are kept alongside their edges so their ids can't be reused
+        self.policy_edges: Dict[int, Tuple[dict, List[Edge]]] = {}
+
+        # Without retain_edges, a mapping's edges are built when the first resource using it is written and
+        # dropped after the last one, counted here by build
+        self.remaining_uses: Dict[int, int] = {}
+
+    def resolve(self, pattern: str) -> Tuple[List[str], str, str]:
+        if pattern not in self.patterns:
+            resource_arns, resource_type, extra = AWSResource.extract_base_arns(pattern, self.aws_resources)
+            self.patterns[pattern] = (resource_arns, AWSResource.label_name(resource_type), extra)
+            metrics.increment("relationships.distinct_patterns")
+        return self.patterns[pattern]
+
+    def service_name(self, label: str) -> str:
+        if label not in self.service_names:
+            service: Service = registry.service_of(label)
+            self.service_names[label] = service.name if service is not None else None
+        return self.service_names[label]
+
+    def builder_for(self, label: str) -> Callable:
+        if label not in self.builders:
+            self.builders[label] = registry.relationship_builder(label)
+        return self.builders[label]
+
+    def prepare(self, aws_resources: Iterable[AWSResource]) -> None:
+
+        # Resources with policies get their policy edges built up front, all distinct mappings in one pass
+        self.prepare_policies([
+            aws_resource.policies for aws_resource in aws_resources
+            if self.builder_for(aws_resource.aws_resource_type) is not None and hasattr(aws_resource, "policies")
+        ])
+
+    def prepare_policies(self, policy_mappings: List[dict]) -> None:
+        policy_mappings = [
+            policies for policy_id, policies in {id(policies): policies for policies in policy_mappings}.items()
+            if policy_id not in self.policy_edges
+        ]
+        for policies in policy_mappings:
+
+            # Every distinct statement is analyzed, and its targets resolved, once across all mappings
+            grants: Dict[Target, List[StatementAnalysis]] = {}
+            denied: Dict[Target, Set[str]] = {}
+            for policy_name in policies:
+                for statement in policies[policy_name]:
+                    analysis: StatementAnalysis = policy_analyzer.analyze(statement)
+                    if analysis.allow:
+                        for target in self.targets(analysis):
+                            grants.setdefault(target, []).append(analysis)
+                    elif analysis.conditional:
+
+                        # Conditions aren't evaluated, so a conditional Deny can't be relied on to take access away
+                        metrics.increment("relationships.conditional_denies_ignored")
+                    else:
+                        for target in self.targets(analysis):
+                            denied.setdefault(target, set()).update(analysis.actions)
+            self.policy_edges[id(policies)] = (policies, self.collapse(grants, denied) if self.collapse_actions else self.expand(grants, denied))
+
+    def targets(self, analysis: StatementAnalysis) -> List[Target]:
+        if analysis.digest not in self.statement_targets:
+            targets: Dict[Target, None] = {}
+            if analysis.not_resource:
+
+                # NotResource reaches every collected resource of the statement's services it doesn't exclude
+                for service_name in sorted(analysis.services()):
+                    service: Service = registry.services.get(service_name)
+                    for label in service.labels() if service is not None else []:
+                        excluded: Set[str] = set()
+                        for pattern in analysis.resource_patterns:
+                            excluded.update(AWSResource.expand_arn(pattern, self.aws_resources.get(label, {})))
+                        for resource_arn in self.aws_resources.get(label, {}):
+                            if resource_arn not in excluded:
+                                targets[(AWSResource.label_name(label), resource_arn, None)] = None
+            else:
+                for pattern in analysis.resource_patterns:
+                    resource_arns, resource_type, extra = self.resolve(pattern)
+                    for resource_arn in resource_arns:
+                        targets[(resource_type, resource_arn, extra)] = None
+            self.statement_targets[analysis.digest] = list(targets)
+            metrics.increment("relationships.distinct_statements")
+        return self.statement_targets[analysis.digest]
+
+    def denied_actions(self, target: Target, denied: Dict[Target, Set[str]]) -> Set[str]:
+
+        # A Deny on every object of a bucket covers grants on any of its object prefixes, and a NotResource Deny,
+        # whose targets have no extra, covers the whole resource
+        resource_type, resource_arn, extra = target
+        actions: Set[str] = set(denied.get(target, ()))
+        actions.update(denied.get((resource_type, resource_arn, "/*"), ()))
+        actions.update(denied.get((resource_type, resource_arn, None), ()))
+        actions.update(denied.get(("WILDCARD_AWS_RESOURCE", "*", None), ()))
+        return actions
+
+    def expand(self, grants: Dict[Target, List[StatementAnalysis]], denied: Dict[Target, Set[str]]) -> List[Edge]:
+
+        # One relationship per action as written in the statement, NotAction statements are named by their
+        # compressed action set. Targets granted by the same statements share their relationships
+        edges: List[Edge] = []
+        relationships: Dict[Tuple[str, Tuple[str, ...], FrozenSet[str]], List[Tuple[str, dict]]] = {}
+        for target, analyses in grants.items():
+            target_denied: FrozenSet[str] = frozenset(self.denied_actions(target, denied)) if denied else frozenset()
+            key: Tuple[str, Tuple[str, ...], FrozenSet[str]] = (target[0], tuple(analysis.digest for analysis in analyses), target_denied)
+            if key not in relationships:
+                relationships[key] = self.expanded_relationships(analyses, self.service_name(target[0]), target_denied)
+            for relationship, properties in relationships[key]:
+                edges.append((relationship, *target, properties))
+        return edges
+
+    def expanded_relationships(self, analyses: List[StatementAnalysis], service_name: str, denied: FrozenSet[str]) -> List[Tuple[str, dict]]:
+
+        # An action granted both with and without a condition isn't conditional
+        conditional: Dict[str, bool] = {}
+        for analysis in analyses:
+            for action in analysis.action_patterns if analysis.action_patterns is not None else policy_analyzer.catalog.compress(analysis.actions_on(service_name)):
+                conditional[action] = conditional.get(action, True) and analysis.conditional
+        relationships: List[Tuple[str, dict]] = []
+        for action in conditional:
+            if denied and ("*" in denied or policy_analyzer.catalog.expand(action) <= denied):
+                continue
+            if action not in self.relationship_types:
+                self.relationship_types[action] = AWSResource.relationship_type(action)
+            relationships.append((self.relationship_types[action], {"conditional": conditional[action]}))
+        return relationships
+
+    def collapse(self, grants: Dict[Target, List[StatementAnalysis]], denied: Dict[Target, Set[str]]) -> List[Edge]:
+
+        # One relationship per target, carrying the granted actions, expanded against the action catalog and
+        # compressed back to "service:*" where a whole service is granted. Targets granted by the same statements
+        # share their properties
+        edges: List[Edge] = []
+        properties: Dict[Tuple[str, Tuple[str, ...], FrozenSet[str]], dict] = {}
+        for target, analyses in grants.items():
+            target_denied: FrozenSet[str] = frozenset(self.denied_actions(target, denied)) if denied else frozenset()
+            key: Tuple[str, Tuple[str, ...], FrozenSet[str]] = (target[0], tuple(analysis.digest for analysis in analyses), target_denied)
+            if key not in properties:
+                properties[key] = self.collapsed_properties(analyses, self.service_name(target[0]), target_denied)
+            if properties[key] is not None:
+                edges.append((COLLAPSED_RELATIONSHIP, *target, properties[key]))
+        return edges
+
+    def collapsed_properties(self, analyses: List[StatementAnalysis], service_name: str, denied: FrozenSet[str]) -> dict:
+        if "*" in denied:
+            return None
+        unconditional: Set[str] = set().union(*(analysis.actions_on(service_name) for analysis in analyses if not analysis.conditional)) - denied
+        conditional: Set[str] = set().union(*(analysis.actions_on(service_name) for analysis in analyses if analysis.conditional)) - denied - unconditional
+        if not unconditional and not conditional:
+            return None
+        return {
+            "actions": policy_analyzer.catalog.compress(frozenset(unconditional | conditional)),
+            "conditional_actions": policy_analyzer.catalog.compress(frozenset(conditional)),
+        }
+
+    def create_lambda_relationships(self, ingestor, lambda_function) -> None:
+
+        # Connect Lambda to triggers
+        for trigger in lambda_function.triggers:
+            source_arns, resource_type, extra = self.resolve(trigger["EventSourceArn"])
+            for source_arn in source_arns:
+                ingestor.add_relationship(resource_type, source_arn, "TRIGGERS", lambda_function.aws_resource_type, lambda_function.arn, None, lambda_function.arn)
+
+        # Connect Lambda to accessible resources
+        if id(lambda_function.policies) not in self.policy_edges:
+            self.prepare_policies([lambda_function.policies])
+        for relationship, resource_type, resource_arn, extra, properties in self.policy_edges[id(lambda_function.policies)][1]:
+            ingestor.add_relationship(lambda_function.aws_resource_type, lambda_function.arn, relationship, resource_type, resource_arn, extra, lambda_function.arn, properties)
+        if id(lambda_function.policies) in self.remaining_uses:
+            self.remaining_uses[id(lambda_function.policies)] -= 1
+            if not self.remaining_uses[id(lambda_function.policies)]:
+                del self.remaining_uses[id(lambda_function.policies)]
+                del self.policy_edges[id(lambda_function.policies)]
+
+    def create_relationships(self, ingestor, aws_resource: AWSResource) -> None:
+        builder: Callable = self.builder_for(aws_resource.aws_resource_type)
+        if builder is not None:
+            builder(self, ingestor, aws_resource)
+        else:
+            aws_resource.create_neo4j_relationships(ingestor, self.aws_resources)
+
+    @metrics.timed("stage.build_relationships")
+    def build(self, ingestor) -> None:
+        policy_resources: Iterable[AWSResource] = (
+            aws_resource for label in self.aws_resources if self.builder_for(label) is not None
+            for aws_resource in self.aws_resources[label].values()
+        )
+        if self.retain_edges:
+            self.prepare(policy_resources)
+        else:
+            for aws_resource in policy_resources:
+                if hasattr(aws_resource, "policies"):
+                    self.remaining_uses[id(aws_resource.policies)] = self.remaining_uses.get(id(aws_resource.policies), 0) + 1
+        for aws_resource_category in self.aws_resources:
+            for resource_arn in self.aws_resources[aws_resource_category]:
+                self.create_relationships(ingestor, self.aws_resources[aws_resource_category][resource_arn])
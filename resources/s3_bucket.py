@@ -1,33 +1,55 @@
 import json
-from typing import Generator, List
+from typing import Generator, Tuple
 
 import botocore
 import boto3
 
 from resources.aws_resource import AWSResource
+from resources.call_scheduler import create_client
+from resources.concurrency import detail_calls
+from resources.policy_statements import statement_pool
 
 
 class S3Bucket(AWSResource):
 
-    def __init__(self, s3_bucket: dict, should_dump_json: bool = False) -> None:
-        self.attr_map = {
-            "name": "BucketName",
-            "arn": "BucketArn",
-        }
-        super().__init__("S3Bucket", s3_bucket, should_dump_json)
-        self.policies: List[dict] = s3_bucket["Policies"]
-
-
-def retrieve_s3_buckets() -> Generator[S3Bucket, None, None]:
-    s3 = boto3.client("s3")
-    for b in s3.list_buckets()["Buckets"]:
-        bucket = {"BucketName": b["Name"]}
-        try:
-            response = s3.get_bucket_policy(Bucket=b["Name"])
-        except botocore.exceptions.ClientError:
-            bucket["Policies"] = []
-        else:
-            bucket["Policies"] = json.loads(response["Policy"])["Statement"]
-
-        bucket["BucketArn"] = f"arn:aws:s3:::{b['Name']}"
+    aws_resource_type = "S3Bucket"
+    attr_map = {
+        "name": "BucketName",
+        "arn": "BucketArn",
+    }
+    __slots__ = tuple(attr_map) + ("policies",)
+
+    def __init__(self, s3_bucket: dict) -> None:
+        super().__init__(s3_bucket)
+        self.policies: Tuple[dict, ...] = statement_pool.intern_statements(s3_bucket["Policies"])
+
+    def to_dict(self) -> dict:
+        d = super().to_dict()
+        d["policies"] = self.policies
+        return d
+
+    def to_record(self) -> dict:
+        record = super().to_record()
+        record["Policies"] = self.policies
+        return record
+
+
+def retrieve_bucket(s3, bucket_name: str) -> dict:
+    bucket = {"BucketName": bucket_name}
+    try:
+        response = s3.get_bucket_policy(Bucket=bucket_name)
+    except botocore.exceptions.ClientError:
+        bucket["Policies"] = []
+    else:
+        bucket["Policies"] = json.loads(response["Policy"])["Statement"]
+
+    bucket["BucketArn"] = f"arn:aws:s3:::{bucket_name}"
+    return bucket
+
+
+def retrieve_s3_buckets(session: boto3.session.Session = None) -> Generator[S3Bucket, None, None]:
+    session = session or boto3.session.Session()
+    s3 = create_client(session, "s3")
+    bucket_names = [b["Name"] for b in s3.list_buckets()["Buckets"]]
+    for bucket in detail_calls.map(lambda bucket_name: retrieve_bucket(s3, bucket_name), bucket_names):
         yield S3Bucket(bucket)
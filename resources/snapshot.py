@@ -0,0 +1,75 @@
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from resources.aws_resource import AWSResource
+from resources.registry import registry
+
+
+MANIFEST = "manifest.json"
+
+
+def snapshot_file(account_id: str, region: str, label: str) -> str:
+    return os.path.join(str(account_id), str(region), f"{label}.jsonl.gz")
+
+
+def write_snapshot(directory: str, aws_resources: Dict[str, Dict[str, dict]]) -> str:
+
+    # Snapshots live in <directory>/<timestamp>/<account>/<region>/<label>.jsonl.gz, one collector record per line
+    timestamp: str = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    snapshot_path: str = os.path.join(directory, timestamp)
+    files: Dict[Tuple[str, str, str], gzip.GzipFile] = {}
+    try:
+        for aws_resource_category in aws_resources:
+            for resource_arn in aws_resources[aws_resource_category]:
+                aws_resource: AWSResource = aws_resources[aws_resource_category][resource_arn]
+                key: Tuple[str, str, str] = (aws_resource.account_id, aws_resource.region, aws_resource.aws_resource_type)
+                if key not in files:
+                    os.makedirs(os.path.join(snapshot_path, str(key[0]), str(key[1])), exist_ok=True)
+                    files[key] = gzip.open(os.path.join(snapshot_path, snapshot_file(*key)), "wt")
+                files[key].write(json.dumps(aws_resource.to_record(), default=str) + "\n")
+    finally:
+        for f in files.values():
+            f.close()
+
+    with open(os.path.join(snapshot_path, MANIFEST), "w") as f:
+        json.dump({
+            "timestamp": timestamp,
+            "files": [
+                {"account_id": account_id, "region": region, "label": label, "path": snapshot_file(account_id, region, label)}
+                for account_id, region, label in sorted(files, key=lambda key: [str(field) for field in key])
+            ]
+        }, f, indent=2)
+    return snapshot_path
+
+
+def resolve_snapshot_path(path: str) -> str:
+
+    # Either a snapshot itself or a directory of snapshots, in which case the latest one is used
+    if os.path.isfile(os.path.join(path, MANIFEST)):
+        return path
+    snapshots: List[str] = sorted(
+        entry for entry in os.listdir(path)
+        if os.path.isfile(os.path.join(path, entry, MANIFEST))
+    )
+    if not snapshots:
+        raise FileNotFoundError(f"No snapshot found in {path}")
+    return os.path.join(path, snapshots[-1])
+
+
+def load_snapshot(path: str, aws_resources: Dict[str, Dict[str, dict]]) -> str:
+    snapshot_path: str = resolve_snapshot_path(path)
+    with open(os.path.join(snapshot_path, MANIFEST)) as f:
+        manifest: dict = json.load(f)
+
+    for entry in manifest["files"]:
+        resource_class = registry.resource_class(entry["label"])
+        with gzip.open(os.path.join(snapshot_path, entry["path"]), "rt") as f:
+            for line in f:
+                aws_resource: AWSResource = resource_class(json.loads(line))
+                aws_resource.account_id = entry["account_id"]
+                aws_resource.region = entry["region"]
+                aws_resources[aws_resource.aws_resource_type][aws_resource.arn] = aws_resource
+    return snapshot_path
@@ -1,46 +1,66 @@
-from typing import Dict, Generator
+from typing import Dict, Generator, Tuple
 
 import boto3
 
 from resources.aws_resource import AWSResource
+from resources.call_scheduler import create_client
+from resources.checkpoint import paginate
+from resources.concurrency import detail_calls
+from resources.policy_statements import intern_strings
 
 
 class SNSTopic(AWSResource):
 
-    def __init__(self, sns_topic: dict, should_dump_json: bool = False) -> None:
-        self.attr_map = {"arn": "TopicArn"}
-        super().__init__("SNSTopic", sns_topic, should_dump_json)
-        self.subscriptions = sns_topic["Subscriptions"]
+    aws_resource_type = "SNSTopic"
+    attr_map = {"arn": "TopicArn"}
+    subscription_fields = ("SubscriptionArn", "Protocol", "Endpoint")
+    __slots__ = tuple(attr_map) + ("subscriptions",)
 
-    def create_neo4j_relationships(self, tx, aws_resources: Dict[str, Dict[str, dict]]) -> None:
+    def __init__(self, sns_topic: dict) -> None:
+        super().__init__(sns_topic)
+        self.subscriptions: Tuple[dict, ...] = tuple(
+            intern_strings({field: subscription[field] for field in self.subscription_fields if field in subscription})
+            for subscription in sns_topic["Subscriptions"]
+        )
+
+    def to_dict(self) -> dict:
+        d = super().to_dict()
+        d["subscriptions"] = self.subscriptions
+        return d
+
+    def to_record(self) -> dict:
+        record = super().to_record()
+        record["Subscriptions"] = self.subscriptions
+        return record
+
+    def needs_inventory(self) -> bool:
+        return any(AWSResource.is_wildcard_pattern(subscription["Endpoint"]) for subscription in self.subscriptions)
+
+    def create_neo4j_relationships(self, ingestor, aws_resources: Dict[str, Dict[str, dict]]) -> None:
         for subscription in self.subscriptions:
             resource_arns, resource_type, extra = AWSResource.extract_base_arns(subscription["Endpoint"], aws_resources)
             for resource_arn in resource_arns:
                 # if not AWSResource.is_existing_resource(resource_arn, resource_type, aws_resources):
                 #     print(f"[!] Flagging non-existing resource: {resource_arn}, {resource_type}, {extra}")
-                AWSResource.create_neo4j_relationship(tx, self.arn, self.aws_resource_type, "sns:notifies", resource_arn, resource_type, extra)
-
+                AWSResource.create_neo4j_relationship(ingestor, self.arn, self.aws_resource_type, "sns:notifies", resource_arn, resource_type, extra, owner=self.arn)
 
-def retrieve_sns_topics() -> Generator[SNSTopic, None, None]:
 
-    sns_topics = {}
-    sns = boto3.client("sns")
+def retrieve_topic(sns, topic_arn: str) -> dict:
+    return {
+        "TopicArn": topic_arn,
+        "Subscriptions": list(paginate(sns, "list_subscriptions_by_topic", "Subscriptions", TopicArn=topic_arn))
+    }
 
-    # Retrieve topics
-    topics_response = sns.list_topics()
-    for topic in topics_response["Topics"]:
-        sns_topics[topic["TopicArn"]] = {
-            "TopicArn": topic["TopicArn"],
-            "Subscriptions": []
-        }
 
-    # Attach subscriptions to topics
-    subscriptions_response = sns.list_subscriptions()
-    for subscription in subscriptions_response["Subscriptions"]:
-        try:
-            sns_topics[subscription["TopicArn"]]["Subscriptions"].append(subscription)
-        except KeyError:
-            pass  # pass any errors due to dangling subscriptions
+def retrieve_sns_topics(session: boto3.session.Session = None) -> Generator[SNSTopic, None, None]:
 
-    for topic_arn in sns_topics:
-        yield SNSTopic(sns_topics[topic_arn])
+    # Subscriptions are listed per topic rather than account-wide and joined, so only the topics in flight
+    # are held in memory, and subscriptions of topics that no longer exist never come up
+    session = session or boto3.session.Session()
+    sns = create_client(session, "sns")
+    for sns_topic in detail_calls.map(
+        lambda topic: retrieve_topic(sns, topic["TopicArn"]),
+        paginate(sns, "list_topics", "Topics"),
+        key=lambda topic: topic["TopicArn"]
+    ):
+        yield SNSTopic(sns_topic)
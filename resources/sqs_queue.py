@@ -3,20 +3,20 @@ from typing import Generator
 import boto3
 
 from resources.aws_resource import AWSResource
+from resources.call_scheduler import create_client
+from resources.checkpoint import paginate
+from resources.concurrency import detail_calls
 
 
 class SQSQueue(AWSResource):
 
-    def __init__(self, sqs_queue: dict, should_dump_json: bool = False) -> None:
-        self.attr_map = {"arn": "QueueArn"}
-        super().__init__("SQSQueue", sqs_queue, should_dump_json)
+    aws_resource_type = "SQSQueue"
+    attr_map = {"arn": "QueueArn"}
+    __slots__ = tuple(attr_map)
 
 
-def retrieve_sqs_queues() -> Generator[SQSQueue, None, None]:
-    sqs = boto3.client("sqs")
-    paginator = sqs.get_paginator("list_queues")
-    for response in paginator.paginate(PaginationConfig={"PageSize": 50}):
-        if "QueueUrls" in response:
-            for queue_url in response["QueueUrls"]:
-                r = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["All"])
-                yield SQSQueue({"QueueArn": r["Attributes"]["QueueArn"]})
+def retrieve_sqs_queues(session: boto3.session.Session = None) -> Generator[SQSQueue, None, None]:
+    session = session or boto3.session.Session()
+    sqs = create_client(session, "sqs")
+    for r in detail_calls.map(lambda queue_url: sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["All"]), paginate(sqs, "list_queues", "QueueUrls", 50)):
+        yield SQSQueue({"QueueArn": r["Attributes"]["QueueArn"]})